@@ -1,16 +1,84 @@
 """
 Chat API Routes - Unified conversational endpoint
 """
-import base64
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+import logging
+import re
+import orjson
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 from services.database import db_service
 from services.ollama_service import ollama_service
 from services.deep_search import deep_search
+from api.uploads import read_upload
 import asyncio
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
+
+
+def _intent_re(words: frozenset, phrases: tuple = ()) -> re.Pattern:
+    """
+    Compile an intent's keywords into one pattern: words match at the start of a word
+    (so 'recommend' also covers 'recommendations'), phrases match anywhere
+    """
+    alternatives = [r"\b(?:" + "|".join(map(re.escape, sorted(words))) + ")"]
+    alternatives.extend(map(re.escape, phrases))
+    return re.compile("|".join(alternatives))
+
+
+# Keywords that explicitly request repair RESOURCES (tutorials, guides, parts)
+_RESOURCE_WORDS = frozenset({
+    'tutorial', 'video', 'guide', 'parts', 'search', 'youtube', 'solution', 'repair'
+})
+_RESOURCE_PHRASES = ('where to buy', 'find parts', 'show me')
+_RESOURCE_RE = _intent_re(_RESOURCE_WORDS, _RESOURCE_PHRASES)
+
+# Keywords that suggest user wants to SEARCH for repair help
+_SEARCH_INTENT_WORDS = frozenset({'yes', 'sure', 'okay', 'ok', 'please', 'find', 'search'})
+_SEARCH_INTENT_PHRASES = ('go ahead',)
+_SEARCH_INTENT_RE = _intent_re(_SEARCH_INTENT_WORDS, _SEARCH_INTENT_PHRASES)
+
+# Keywords that indicate a QUESTION/ADVICE request (not resource search)
+_QUESTION_WORDS = frozenset({
+    'should', 'worth', 'cost', 'replace', 'advice', 'recommend', 'opinion', 'suggest'
+})
+_QUESTION_PHRASES = ('how much', 'buy new', 'what do you think', '?')
+_QUESTION_RE = _intent_re(_QUESTION_WORDS, _QUESTION_PHRASES)
+
+# Keywords that ask where to find the serial/model label
+_SERIAL_WORDS = frozenset({'serial', 'model', 'number', 'label'})
+_SERIAL_RE = _intent_re(_SERIAL_WORDS)
+
+
+# Detection values that carry no information for titles and search queries
+_INVALID_OBJECT_NAMES = frozenset({'', 'unknown', 'n/a', 'none', 'blank', 'image'})
+_GENERIC_BRANDS = frozenset({'unknown', 'generic', 'n/a', ''})
+_GENERIC_MODELS = frozenset({'unknown', 'n/a', ''})
+_DAMAGED_CONDITIONS = frozenset({'broken', 'damaged'})
+
+# Leading bytes of the upload formats browsers display -> media type (uploads are stored as sent)
+_IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+# Filler words stripped from issue text before building search keywords
+_FILLER_RE = re.compile(r'\b(?:the|is|are|has|have|appears|seems|visible|showing|signs of)\b')
+
+
+def _image_media_type(image: bytes) -> str:
+    """Sniff an image's media type from its leading bytes"""
+    for signature, media_type in _IMAGE_SIGNATURES:
+        if image.startswith(signature):
+            return media_type
+    if image[:4] == b'RIFF' and image[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
 
 
 class ChatMessage(BaseModel):
@@ -63,14 +131,20 @@ async def create_session():
 
 
 @router.get("/sessions/{session_id}")
-async def get_session(session_id: str):
+async def get_session(session_id: str, request: Request):
     """Get a specific session with messages"""
-    session = await db_service.get_session(session_id)
+    session, messages, detected_item = await asyncio.gather(
+        db_service.get_session(session_id),
+        db_service.get_messages(session_id),
+        db_service.get_detected_item(session_id)
+    )
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    messages = await db_service.get_messages(session_id)
-    detected_item = await db_service.get_detected_item(session_id)
+    # Images are served separately - the browser fetches them only when rendered
+    for msg in messages:
+        if msg.pop("has_image"):
+            msg["image_url"] = str(request.url_for("get_message_image", message_id=msg["id"]))
     
     return {
         **session,
@@ -107,12 +181,12 @@ async def update_detected_item(session_id: str, request: UpdateDetectedItemReque
         "description": request.description,
     }
     
-    # Save updated detection
-    await db_service.save_detected_item(session_id, detection_data)
-    
-    # Update session title
-    title = f"{request.brand + ' ' if request.brand else ''}{request.object}"
-    await db_service.update_session_title(session_id, title[:30])
+    # Save updated detection and session title concurrently
+    title = f"{request.brand} {request.object}" if request.brand else request.object
+    await asyncio.gather(
+        db_service.save_detected_item(session_id, detection_data),
+        db_service.update_session_title(session_id, title)
+    )
     
     return {"status": "updated", "data": detection_data}
 
@@ -126,17 +200,15 @@ class SaveMessageRequest(BaseModel):
 @router.post("/sessions/{session_id}/messages")
 async def save_message(session_id: str, request: SaveMessageRequest):
     """Save a message to a session (used for live video detection)"""
-    # Verify session exists
-    session = await db_service.get_session(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    await db_service.add_message(
+    message_id = await db_service.add_message(
         session_id=session_id,
         role=request.role,
         content=request.content,
         metadata=request.metadata
     )
+    # add_message only inserts when the session exists
+    if message_id is None:
+        raise HTTPException(status_code=404, detail="Session not found")
     
     return {"status": "saved"}
 
@@ -145,6 +217,7 @@ async def save_message(session_id: str, request: SaveMessageRequest):
 
 @router.post("/message")
 async def send_message(
+    background_tasks: BackgroundTasks,
     message: str = Form(""),
     session_id: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None)
@@ -160,27 +233,24 @@ async def send_message(
         
         # Read image if provided
         image_bytes = None
-        image_base64 = None
         if image:
-            image_bytes = await image.read()
-            # Store as base64 data URL for persistence
-            image_base64 = f"data:image/jpeg;base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+            image_bytes = await read_upload(image)
         
-        # Save user message with image data
+        # Save user message with image bytes (stored as a BLOB, not base64)
         await db_service.add_message(
             session_id=session_id,
             role="user",
             content=message or "[Image uploaded]",
             images_count=1 if image_bytes else 0,
-            image_data=image_base64
+            image=image_bytes
         )
         
-        # Get existing detected item for context
-        detected_item = await db_service.get_detected_item(session_id)
-        
-        # Get conversation history (sliding window + key facts)
-        recent_messages = await db_service.get_recent_messages(session_id, limit=6)
-        conversation_context = await db_service.get_conversation_context(session_id)
+        # Get detected item, conversation history (sliding window) and key facts concurrently
+        detected_item, recent_messages, conversation_context = await asyncio.gather(
+            db_service.get_detected_item(session_id),
+            db_service.get_recent_messages(session_id, limit=6),
+            db_service.get_conversation_context(session_id)
+        )
         
         # Determine what to do based on input
         response_type = "text"
@@ -191,28 +261,26 @@ async def send_message(
         if image_bytes:
             # Image provided - run detection
             detection_result = await ollama_service.detect_object(image_bytes)
-            print(f"Detection result: {detection_result}")  # Debug logging
+            logger.debug("Detection result: %s", detection_result)
             
             # Check if we got a valid object (not empty, not "Detection failed", not blank descriptions)
             obj = detection_result.get('object', '')
             is_valid = (
                 obj and 
                 obj != 'Detection failed' and 
-                obj.lower() not in ['', 'unknown', 'n/a', 'none', 'blank', 'image']
+                obj.lower() not in _INVALID_OBJECT_NAMES
             )
             
             if is_valid:
-                # Save detected item
-                await db_service.save_detected_item(session_id, detection_result)
-                
-                # Update session title with 2-4 word summary
+                # Build session title with 2-4 word summary
                 item_name = detection_result.get('object', 'Item')
-                condition = detection_result.get('condition', '')
+                condition = detection_result.get('condition', 'unknown')
+                condition_label = condition.capitalize()
                 issues = detection_result.get('issues', [])
                 
                 # Create short title: "Broken Laptop" or "Damaged Headphones"
-                if condition in ['broken', 'damaged']:
-                    title = f"{condition.capitalize()} {item_name}"
+                if condition in _DAMAGED_CONDITIONS:
+                    title = f"{condition_label} {item_name}"
                 elif issues:
                     # Extract first issue keyword
                     first_issue = issues[0].split(':')[0] if ':' in issues[0] else issues[0].split()[0]
@@ -220,25 +288,28 @@ async def send_message(
                 else:
                     title = item_name
                 
-                await db_service.update_session_title(session_id, title[:30])
+                # Save detected item and update the title concurrently (independent rows)
+                await asyncio.gather(
+                    db_service.save_detected_item(session_id, detection_result),
+                    db_service.update_session_title(session_id, title)
+                )
                 
                 response_type = "detection"
                 response_data = detection_result
                 
                 # Build AI message
-                condition = detection_result.get('condition', 'unknown')
-                issues = detection_result.get('issues', [])
-                
-                ai_message = f"I identified this as a **{title}**.\n\n"
-                ai_message += f"**Condition:** {condition.capitalize()}\n\n"
+                message_parts = [
+                    f"I identified this as a **{title}**.\n\n",
+                    f"**Condition:** {condition_label}\n\n"
+                ]
                 
                 if issues:
-                    ai_message += "**Issues detected:**\n"
-                    for issue in issues:
-                        ai_message += f"• {issue}\n"
-                    ai_message += "\n"
+                    message_parts.append("**Issues detected:**\n")
+                    message_parts.extend(f"• {issue}\n" for issue in issues)
+                    message_parts.append("\n")
                 
-                ai_message += "Would you like me to search for repair guides and spare parts?"
+                message_parts.append("Would you like me to search for repair guides and spare parts?")
+                ai_message = "".join(message_parts)
                 
                 # Add detection card
                 cards.append({
@@ -253,26 +324,15 @@ async def send_message(
             # Text message with existing context
             message_lower = message.lower()
             
-            # Keywords that explicitly request repair RESOURCES (tutorials, guides, parts)
-            resource_keywords = ['tutorial', 'video', 'guide', 'parts', 'where to buy', 'search', 'find parts', 'show me', 'youtube', 'solutions', 'repair']
-            
-            # Keywords that suggest user wants to SEARCH for repair help
-            search_intent = ['yes', 'sure', 'okay', 'ok', 'please', 'go ahead', 'find', 'search']
+            # Determine intent - each check only runs when its branch is still reachable
+            wants_resources = _RESOURCE_RE.search(message_lower) is not None
+            is_question = not wants_resources and _QUESTION_RE.search(message_lower) is not None
             
-            # Keywords that indicate a QUESTION/ADVICE request (not resource search)
-            question_keywords = ['should', 'worth', 'cost', 'how much', 'buy new', 'replace', 'advice', 'recommend', 'what do you think', 'opinion', 'suggest', '?']
+            logger.debug("Search intent check: wants_resources=%s, is_question=%s", wants_resources, is_question)
+            logger.debug("Using detected_item: %s", detected_item)
             
-            # Determine intent
-            wants_resources = any(word in message_lower for word in resource_keywords)
-            is_question = any(word in message_lower for word in question_keywords)
-            is_simple_yes = any(word in message_lower for word in search_intent) and len(message.split()) <= 5
-            
-            # Debug logging
-            print(f"Search intent check: wants_resources={wants_resources}, is_question={is_question}, is_simple_yes={is_simple_yes}")
-            print(f"Using detected_item: {detected_item}")
-            
-            # If it's a question/advice request, use conversational AI
-            if is_question and not wants_resources:
+            # If it's a question/advice request (and not a resource request), use conversational AI
+            if is_question:
                 # User asking for advice - use AI to answer with conversation memory
                 ai_message = await ollama_service.chat_response(
                     message, 
@@ -293,7 +353,11 @@ async def send_message(
                 if topic:
                     await db_service.update_conversation_context(session_id, topic=topic)
             
-            elif wants_resources or is_simple_yes:
+            elif wants_resources or (
+                # Simple "yes"/"sure" reply to the search offer
+                len(message.split()) <= 5
+                and _SEARCH_INTENT_RE.search(message_lower) is not None
+            ):
                 # Search for repairs using deep search
                 response_type = "repair_results"
                 
@@ -310,9 +374,9 @@ async def send_message(
                 query_parts = []
                 
                 # Add brand/model only if they provide value (not generic)
-                if brand and brand.lower() not in ['unknown', 'generic', 'n/a', '']:
+                if brand.lower() not in _GENERIC_BRANDS:
                     query_parts.append(brand)
-                if model and model.lower() not in ['unknown', 'n/a', '']:
+                if model.lower() not in _GENERIC_MODELS:
                     query_parts.append(model)
                 
                 # Always include object type
@@ -323,27 +387,26 @@ async def send_message(
                 problem_keywords = []
                 if issues:
                     for issue in issues[:2]:  # Max 2 issues for focused query
-                        # Clean up the issue text - extract key problem words
-                        issue_clean = issue.lower()
-                        # Remove common filler words
-                        for filler in ['the', 'is', 'are', 'has', 'have', 'appears', 'seems', 'visible', 'showing', 'signs of']:
-                            issue_clean = issue_clean.replace(filler, '')
+                        # Clean up the issue text - remove filler words in a single pass
+                        issue_clean = _FILLER_RE.sub('', issue.lower())
                         # Get core problem words
-                        issue_words = [w.strip() for w in issue_clean.split() if len(w.strip()) > 2]
+                        issue_words = [w for w in issue_clean.split() if len(w) > 2]
                         if issue_words:
                             problem_keywords.extend(issue_words[:3])  # Max 3 words per issue
                 
-                # Add unique problem keywords
-                seen = set()
+                # Add unique problem keywords (the lowercased set also tracks keywords already added)
+                query_parts_lower = {p.lower() for p in query_parts}
+                added = 0
                 for kw in problem_keywords:
-                    if kw not in seen and kw not in [p.lower() for p in query_parts]:
+                    if kw not in query_parts_lower:
                         query_parts.append(kw)
-                        seen.add(kw)
-                        if len(seen) >= 3:  # Max 3 problem keywords
+                        query_parts_lower.add(kw)
+                        added += 1
+                        if added >= 3:  # Max 3 problem keywords
                             break
                 
                 # Add "repair" or "fix" based on condition
-                if condition in ['broken', 'damaged']:
+                if condition in _DAMAGED_CONDITIONS:
                     query_parts.append('repair fix')
                 else:
                     query_parts.append('repair')
@@ -361,8 +424,8 @@ async def send_message(
                     context_parts.append(f"Details: {description}")
                 context = " | ".join(context_parts) if context_parts else None
                 
-                print(f"Deep search query: {search_query}")
-                print(f"Context: {context}")
+                logger.debug("Deep search query: %s", search_query)
+                logger.debug("Context: %s", context)
                 
                 # Run deep search across Reddit, Forums, and YouTube
                 search_results = await deep_search({
@@ -376,8 +439,11 @@ async def send_message(
                 forum_results = search_results.get("results", {}).get("forums", [])
                 youtube_results = search_results.get("results", {}).get("youtube", [])
                 
-                print(f"Deep search results: Reddit={len(reddit_results)}, Forums={len(forum_results)}, YouTube={len(youtube_results)}")
-                print(f"Search completed in {search_results.get('search_time_ms', 0):.0f}ms")
+                logger.debug(
+                    "Deep search results: Reddit=%d, Forums=%d, YouTube=%d",
+                    len(reddit_results), len(forum_results), len(youtube_results)
+                )
+                logger.debug("Search completed in %.0fms", search_results.get("search_time_ms", 0))
                 
                 response_data = {
                     "youtube": youtube_results,
@@ -386,30 +452,31 @@ async def send_message(
                     "search_time_ms": search_results.get("search_time_ms", 0)
                 }
                 
-                ai_message = "Here's what I found to help you repair your item:\n\n"
+                message_parts = ["Here's what I found to help you repair your item:\n\n"]
                 
                 if youtube_results:
-                    ai_message += f"📺 **{len(youtube_results)} Video Tutorials**\n"
+                    message_parts.append(f"📺 **{len(youtube_results)} Video Tutorials**\n")
                     cards.append({
                         "type": "youtube_card",
                         "data": youtube_results[:4]
                     })
                 
                 if forum_results:
-                    ai_message += f"📖 **{len(forum_results)} Repair Guides & Articles**\n"
+                    message_parts.append(f"📖 **{len(forum_results)} Repair Guides & Articles**\n")
                     cards.append({
                         "type": "guides_card",
                         "data": forum_results[:4]
                     })
                 
                 if reddit_results:
-                    ai_message += f"💬 **{len(reddit_results)} Reddit Discussions**\n"
+                    message_parts.append(f"💬 **{len(reddit_results)} Reddit Discussions**\n")
                     cards.append({
                         "type": "reddit_card",
                         "data": reddit_results[:4]
                     })
                 
-                ai_message += "\nClick on any card to learn more. Need help with something specific?"
+                message_parts.append("\nClick on any card to learn more. Need help with something specific?")
+                ai_message = "".join(message_parts)
                 
                 # Track that we searched for repairs (key fact for context)
                 await db_service.update_conversation_context(
@@ -418,7 +485,7 @@ async def send_message(
                     topic="repair resources"
                 )
             
-            elif any(word in message_lower for word in ['serial', 'model', 'number', 'label']):
+            elif _SERIAL_RE.search(message_lower):
                 ai_message = "To find the serial number, look for a sticker on the back or bottom of your device. It usually starts with 'S/N' or 'Serial'. Upload a photo of it and I'll extract the details!"
                 response_type = "clarification"
             
@@ -441,12 +508,14 @@ async def send_message(
             ai_message = "Hello! I'm your repair assistant. Upload a photo of something broken and I'll help you fix it!"
             response_type = "text"
         
-        # Save AI response (include image_data for detection responses so image shows in chat history)
-        await db_service.add_message(
+        # Save AI response after the reply is sent - the response body doesn't depend on it
+        # (attach the image for detection responses so it shows in chat history)
+        background_tasks.add_task(
+            db_service.add_message,
             session_id=session_id,
             role="assistant",
             content=ai_message,
-            image_data=image_base64 if response_type == "detection" else None,
+            image=image_bytes if response_type == "detection" else None,
             metadata={"response_type": response_type, "data": response_data}
         )
         
@@ -455,15 +524,57 @@ async def send_message(
             "message": ai_message,
             "response_type": response_type,
             "data": response_data,
-            "cards": cards if cards else None
+            "cards": cards or None
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
+@router.get("/messages/{message_id}/image")
+async def get_message_image(message_id: str):
+    """Get the image attached to a message"""
+    image = await db_service.get_message_image(message_id)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # A message's image never changes once written, so its URL can be cached indefinitely
+    return Response(
+        content=image,
+        media_type=_image_media_type(image),
+        headers={"Cache-Control": "private, max-age=31536000, immutable"}
+    )
+
+
 @router.get("/messages/{session_id}")
-async def get_messages(session_id: str):
-    """Get all messages for a session"""
-    messages = await db_service.get_messages(session_id)
-    return {"messages": messages}
+async def get_messages(session_id: str, request: Request):
+    """Get all messages for a session (streamed row by row for long histories)"""
+    def encode(msg: dict) -> bytes:
+        # Same image links as get_session - images are served separately
+        if msg.pop("has_image"):
+            msg["image_url"] = str(request.url_for("get_message_image", message_id=msg["id"]))
+        return orjson.dumps(msg)
+    
+    # Open the cursor and read the first row before committing to a 200 - failures here are still a 500
+    rows = db_service.iter_messages(session_id)
+    try:
+        first = await anext(rows, None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load messages: {str(e)}")
+    
+    async def stream():
+        yield b'{"messages":['
+        if first is None:
+            yield b']}'
+            return
+        yield encode(first)
+        try:
+            async for msg in rows:
+                yield b',' + encode(msg)
+        except Exception as e:
+            # Headers are already sent - close the document so the body stays valid JSON
+            logger.warning("Message stream for session %s failed: %s", session_id, e)
+            yield b'],"error":"Message history truncated"}'
+            return
+        yield b']}'
+    
+    return StreamingResponse(stream(), media_type="application/json")
@@ -1,12 +1,15 @@
 """
 Detection API Routes
 """
+import asyncio
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import ORJSONResponse
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from services.ollama_service import ollama_service
+from api.uploads import read_upload
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
 class DetectionResponse(BaseModel):
@@ -38,6 +41,17 @@ class SerialExtractionResponse(BaseModel):
     other_codes: list[str]
 
 
+# Validators built once at import and reused for every response
+_DETECTION_ADAPTER = TypeAdapter(DetectionResponse)
+_OBJECT_DETECTION_ADAPTER = TypeAdapter(ObjectDetectionResponse)
+_SERIAL_EXTRACTION_ADAPTER = TypeAdapter(SerialExtractionResponse)
+
+
+async def _no_upload() -> None:
+    """Placeholder read for an optional upload that wasn't sent"""
+    return None
+
+
 @router.post("/full", response_model=DetectionResponse)
 async def detect_full(
     item_image: UploadFile = File(..., description="Image of the item"),
@@ -53,18 +67,16 @@ async def detect_full(
     Returns detected object info, brand, model, serial number, condition, and issues.
     """
     try:
-        # Read item image
-        item_bytes = await item_image.read()
-        
-        # Read serial image if provided
-        serial_bytes = None
-        if serial_image:
-            serial_bytes = await serial_image.read()
+        # Read item image and serial image (if provided) concurrently
+        item_bytes, serial_bytes = await asyncio.gather(
+            read_upload(item_image),
+            read_upload(serial_image) if serial_image else _no_upload()
+        )
         
         # Run combined detection
         result = await ollama_service.combined_detection(item_bytes, serial_bytes)
         
-        return DetectionResponse(**result)
+        return _DETECTION_ADAPTER.validate_python(result)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
@@ -76,9 +88,9 @@ async def detect_object(
 ):
     """Detect object, brand, model, and condition from a single image"""
     try:
-        image_bytes = await image.read()
+        image_bytes = await read_upload(image)
         result = await ollama_service.detect_object(image_bytes)
-        return ObjectDetectionResponse(**result)
+        return _OBJECT_DETECTION_ADAPTER.validate_python(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
@@ -89,8 +101,8 @@ async def extract_serial(
 ):
     """Extract serial number and product codes from image"""
     try:
-        image_bytes = await image.read()
+        image_bytes = await read_upload(image)
         result = await ollama_service.extract_serial(image_bytes)
-        return SerialExtractionResponse(**result)
+        return _SERIAL_EXTRACTION_ADAPTER.validate_python(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Serial extraction failed: {str(e)}")
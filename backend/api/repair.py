@@ -4,12 +4,28 @@ Uses Deep Search for comprehensive results from Reddit, Forums, and YouTube
 """
 import asyncio
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional
+from urllib.parse import urldefrag, urlsplit
+from cachetools import TTLCache
 from services.deep_search import deep_search
+from services.deep_search.youtube_search import YouTubeSearch
 from services.guide_extractor import guide_extractor
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Extracted guides keyed by canonical URL - page content changes rarely
+EXTRACT_CACHE_TTL = 24 * 60 * 60  # seconds
+_extract_cache: TTLCache = TTLCache(maxsize=256, ttl=EXTRACT_CACHE_TTL)
+
+# Site-specific extractors keyed by domain - everything else uses the generic article extractor
+_EXTRACTORS = {
+    "ifixit.com": guide_extractor.extract_ifixit_guide,
+}
+
+# Shared YouTube client for transcript requests
+_youtube = YouTubeSearch()
 
 
 class RepairSearchRequest(BaseModel):
@@ -25,6 +41,7 @@ class RepairSearchResponse(BaseModel):
     reddit: list = []
     query_used: str
     search_time_ms: float = 0.0
+    timed_out: list[str] = []  # Sources that hit the timeout - results are partial
 
 
 class TranscriptRequest(BaseModel):
@@ -42,29 +59,20 @@ class ExtractRequest(BaseModel):
     url: str
 
 
+def _build_query(request: RepairSearchRequest, suffix: str, include_issue: bool = False) -> str:
+    """Join the non-empty brand/model/object (and optionally first issue) with a search suffix"""
+    first_issue = request.issues[0].split(":")[-1].strip() if include_issue and request.issues else ""
+    return " ".join(filter(None, (request.brand, request.model, request.object, first_issue, suffix)))
+
+
 @router.post("/search", response_model=RepairSearchResponse)
 async def search_repairs(request: RepairSearchRequest):
     """
     Search for repair guides from Reddit, Forums, and YouTube using Deep Search.
     """
     try:
-        # Build search query from request
-        query_parts = []
-        if request.brand:
-            query_parts.append(request.brand)
-        if request.model:
-            query_parts.append(request.model)
-        if request.object:
-            query_parts.append(request.object)
-        if request.issues:
-            # Add first issue for specificity
-            first_issue = request.issues[0]
-            if ":" in first_issue:
-                first_issue = first_issue.split(":")[-1].strip()
-            query_parts.append(first_issue)
-        query_parts.append("repair")
-        
-        search_query = " ".join(query_parts)
+        # Build search query from request (first issue adds specificity)
+        search_query = _build_query(request, "repair", include_issue=True)
         context = f"Issues: {', '.join(request.issues)}" if request.issues else None
         
         # Run deep search
@@ -75,13 +83,17 @@ async def search_repairs(request: RepairSearchRequest):
             "max_results": 10
         })
         
-        return RepairSearchResponse(
-            youtube=results.get("results", {}).get("youtube", []),
-            web=results.get("results", {}).get("forums", []),
-            reddit=results.get("results", {}).get("reddit", []),
-            query_used=search_query,
-            search_time_ms=results.get("search_time_ms", 0)
-        )
+        # Plain dict - response_model validates it once on the way out,
+        # constructing RepairSearchResponse here would validate and then re-validate
+        source_results = results.get("results", {})
+        return {
+            "youtube": source_results.get("youtube", []),
+            "web": source_results.get("forums", []),
+            "reddit": source_results.get("reddit", []),
+            "query_used": search_query,
+            "search_time_ms": results.get("search_time_ms", 0),
+            "timed_out": results.get("timed_out", [])
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
@@ -91,14 +103,23 @@ async def search_repairs(request: RepairSearchRequest):
 async def get_video_transcript(request: TranscriptRequest):
     """Get video info and transcript."""
     try:
-        from services.deep_search.youtube_search import YouTubeSearch
+        # Metadata and transcript are independent requests - fetch them concurrently
+        video_info, transcript = await asyncio.gather(
+            _youtube.get_video_info(request.video_id),
+            _youtube._get_transcript(request.video_id),
+            return_exceptions=True
+        )
+        if isinstance(video_info, Exception):
+            video_info = None
+        if isinstance(transcript, Exception):
+            transcript = ""
         
-        youtube = YouTubeSearch()
-        transcript = await youtube._get_transcript(request.video_id)
+        if not video_info and not transcript:
+            raise HTTPException(status_code=404, detail="Video not found")
         
         return TranscriptResponse(
             video_id=request.video_id,
-            title="",  # Would need separate API call for title
+            title=video_info.get("title", "") if video_info else "",
             description="",
             summary=transcript[:1000] if transcript else "No transcript available"
         )
@@ -113,16 +134,22 @@ async def get_video_transcript(request: TranscriptRequest):
 async def extract_guide(request: ExtractRequest):
     """Extract repair guide content from a URL."""
     try:
-        url = request.url
+        url = request.url.strip()
+        cache_key = urldefrag(url).url.rstrip("/")
+        cached = _extract_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        if "ifixit.com" in url:
-            result = await guide_extractor.extract_ifixit_guide(url)
-        else:
-            result = await guide_extractor.extract_article_content(url)
+        # Dispatch on the domain's last two labels so subdomains (www., de.) match too
+        host = urlsplit(url).hostname or ""
+        domain = ".".join(host.rsplit(".", 2)[-2:])
+        extractor = _EXTRACTORS.get(domain, guide_extractor.extract_article_content)
+        result = await extractor(url)
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
         
+        _extract_cache[cache_key] = result
         return result
         
     except HTTPException:
@@ -136,16 +163,7 @@ async def search_parts(request: RepairSearchRequest):
     """Search for replacement parts using deep search."""
     try:
         # Build parts-specific query
-        query_parts = []
-        if request.brand:
-            query_parts.append(request.brand)
-        if request.model:
-            query_parts.append(request.model)
-        if request.object:
-            query_parts.append(request.object)
-        query_parts.append("replacement parts buy")
-        
-        search_query = " ".join(query_parts)
+        search_query = _build_query(request, "replacement parts buy")
         
         # Use forums search for parts (includes eBay, Amazon links)
         results = await deep_search({
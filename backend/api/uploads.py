@@ -0,0 +1,21 @@
+"""
+Upload helpers shared by the API routes
+"""
+from fastapi import UploadFile
+
+# Starlette keeps uploads up to this size in memory (SpooledTemporaryFile max_size)
+SPOOL_MAX_SIZE = 1024 * 1024
+# Larger uploads are rolled to disk and read in chunks
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+async def read_upload(upload: UploadFile) -> bytes | bytearray:
+    """Read an uploaded file with a single copy where possible"""
+    if upload.size is not None and upload.size <= SPOOL_MAX_SIZE:
+        # Still in the in-memory spool - read directly, no thread hop needed
+        return upload.file.read()
+    
+    buffer = bytearray()
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        buffer += chunk
+    return buffer
@@ -3,15 +3,60 @@ WebSocket endpoint for live video stream analysis
 Implements DROP policy: discard frames if GPU is busy, don't queue
 """
 import asyncio
-import base64
-import json
+import hashlib
+import logging
+import struct
+import orjson
+import pybase64
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from services.ollama_service import ollama_service
 from services.database import db_service
-from time import time
+from collections import OrderedDict
+from time import monotonic, time
 from typing import Optional
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Framed binary message: type (u8) + session_id length (u32), then session_id, then JPEG
+_FRAME_HEADER = struct.Struct("<BI")
+BINARY_FRAME_TYPE = 1
+_JPEG_MAGIC = b"\xff\xd8"
+
+# Frames buffered per client while its previous frame is processed - a newer frame
+# replaces the waiting one (leaky, latest-frame-wins), so stale frames are never analysed
+FRAME_QUEUE_SIZE = 1
+
+# How long a finished detection stays shareable with clients sending the same frame
+SHARED_RESULT_TTL = 5.0  # seconds
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets on a monotonic clock, bounded by LRU eviction"""
+    
+    def __init__(self, rate: float, burst: float, max_clients: int = 10_000):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+    
+    def try_consume(self, client_id: str, cost: float = 1.0) -> bool:
+        """Take `cost` tokens from the client's bucket, returning False if it's short"""
+        now = monotonic()
+        tokens, last_refill = self._buckets.get(client_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last_refill) * self.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        
+        self._buckets[client_id] = (tokens, now)
+        self._buckets.move_to_end(client_id)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return allowed
+    
+    def discard(self, client_id: str):
+        self._buckets.pop(client_id, None)
 
 
 class LiveVisionStream:
@@ -19,68 +64,126 @@ class LiveVisionStream:
     
     def __init__(self):
         self.connections: dict[str, WebSocket] = {}
-        self.last_analysis_time: dict[str, float] = {}
+        # Rate limiting: 1 analysis per 2 seconds per client, short bursts of 2
+        self.rate_limiter = TokenBucketLimiter(rate=0.5, burst=2)
+        # Detections keyed by frame hash - identical frames share one inference
+        self.inflight: dict[bytes, asyncio.Future] = {}
+        # One bounded frame queue + consumer task per client (back-pressure instead of task-per-frame)
+        self.frame_queues: dict[str, asyncio.Queue] = {}
+        self.consumers: dict[str, asyncio.Task] = {}
     
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
         self.connections[client_id] = websocket
-        self.last_analysis_time[client_id] = 0
-        print(f"📹 Client {client_id} connected to live vision stream")
+        self.frame_queues[client_id] = asyncio.Queue(maxsize=FRAME_QUEUE_SIZE)
+        self.consumers[client_id] = asyncio.create_task(self._consume_frames(client_id))
+        logger.info("Client %s connected to live vision stream", client_id)
     
     def disconnect(self, client_id: str):
         self.connections.pop(client_id, None)
-        self.last_analysis_time.pop(client_id, None)
-        print(f"📹 Client {client_id} disconnected")
+        self.rate_limiter.discard(client_id)
+        self.frame_queues.pop(client_id, None)
+        consumer = self.consumers.pop(client_id, None)
+        if consumer:
+            consumer.cancel()
+        logger.info("Client %s disconnected", client_id)
     
     async def send_json(self, client_id: str, data: dict):
-        """Send JSON to client if connected"""
+        """Send JSON to client if connected (text frame - the client JSON.parses it)"""
         ws = self.connections.get(client_id)
         if ws:
             try:
-                await ws.send_json(data)
+                await ws.send_text(orjson.dumps(data).decode())
             except Exception as e:
-                print(f"Send error: {e}")
+                logger.warning("Send error: %s", e)
+    
+    def enqueue_frame(self, client_id: str, frame: str | bytes | memoryview, session_id: Optional[str]) -> bool:
+        """Queue a frame for the client's consumer, returning False if an older waiting frame was dropped"""
+        frame_queue = self.frame_queues.get(client_id)
+        if frame_queue is None:
+            return True
+        replaced = frame_queue.full()
+        if replaced:
+            frame_queue.get_nowait()
+        frame_queue.put_nowait((frame, session_id))
+        return not replaced
+    
+    async def _consume_frames(self, client_id: str):
+        """Process a client's queued frames one at a time until it disconnects"""
+        frame_queue = self.frame_queues[client_id]
+        while True:
+            frame, session_id = await frame_queue.get()
+            await self.process_frame(client_id, frame, session_id)
+    
+    async def _detect_shared(self, frame_key: bytes, frame_bytes: bytes) -> dict:
+        """Run detection and publish the result to other clients sending the same frame"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.inflight[frame_key] = future
+        try:
+            result = await ollama_service.detect_object_live(frame_bytes)
+        except BaseException as e:
+            # Includes cancellation (the leading client disconnected) - joiners must not wait forever
+            if not future.done():
+                reason = "Cancelled" if isinstance(e, asyncio.CancelledError) else str(e)
+                future.set_result({"error": f"Processing error: {reason}"})
+            self.inflight.pop(frame_key, None)
+            raise
+        
+        future.set_result(result)
+        if result.get("skipped") or result.get("error"):
+            self.inflight.pop(frame_key, None)
+        else:
+            loop.call_later(SHARED_RESULT_TTL, self.inflight.pop, frame_key, None)
+        return result
     
     async def process_frame(
         self,
         client_id: str,
-        frame_base64: str,
+        frame: str | bytes | memoryview,
         session_id: Optional[str] = None
     ):
         """
         Process a single frame from live video.
+        Accepts raw JPEG bytes/memoryview (binary messages) or a base64 string (legacy JSON messages).
         DROP policy: if GPU is busy, discard frame immediately.
         """
-        print(f"🔄 Processing frame for client {client_id}")
+        logger.debug("Processing frame for client %s", client_id)
         ws = self.connections.get(client_id)
         if not ws:
-            print(f"❌ No WebSocket for client {client_id}")
+            logger.debug("No WebSocket for client %s", client_id)
             return
         
-        # Check if GPU is busy - DROP policy
-        if ollama_service._is_processing:
-            print(f"⏭️ GPU busy, dropping frame")
-            await self.send_json(client_id, {
-                "type": "dropped",
-                "reason": "GPU busy processing previous frame"
-            })
-            return
+        # Same frame already being analysed (e.g. several clients on one camera) - join it
+        frame_key = hashlib.blake2b(
+            frame.encode() if isinstance(frame, str) else frame, digest_size=16
+        ).digest()
+        shared = self.inflight.get(frame_key)
         
-        # Rate limiting: max 1 analysis per 2 seconds per client
+        if shared is None:
+            # Check if GPU is busy - DROP policy
+            if ollama_service.is_busy:
+                logger.debug("GPU busy, dropping frame")
+                await self.send_json(client_id, {
+                    "type": "dropped",
+                    "reason": "GPU busy processing previous frame"
+                })
+                return
+            
+            # Rate limiting per client
+            if not self.rate_limiter.try_consume(client_id):
+                logger.debug("Rate limit: no tokens left for client %s", client_id)
+                return  # Silently drop, too soon
+            
+            logger.debug("Rate limit passed, processing frame")
         current_time = time()
-        last_time = self.last_analysis_time.get(client_id, 0)
-        time_diff = current_time - last_time
-        if time_diff < 2.0:
-            print(f"⏱️ Rate limit: {time_diff:.1f}s since last, need 2s")
-            return  # Silently drop, too soon
-        
-        print(f"✅ Rate limit passed, processing frame...")
-        self.last_analysis_time[client_id] = current_time
         
         try:
-            # Decode frame
-            frame_bytes = base64.b64decode(frame_base64)
-            print(f"📦 Decoded frame: {len(frame_bytes)} bytes")
+            if shared is None:
+                # Binary frames arrive as raw JPEG - only legacy JSON frames need decoding,
+                # done off the event loop so other clients' traffic isn't stalled
+                frame_bytes = await asyncio.to_thread(pybase64.b64decode, frame) if isinstance(frame, str) else frame
+                logger.debug("Decoded frame: %d bytes", len(frame_bytes))
             
             # Skip quality check for now - just process
             # quality_result = ollama_service.check_image_quality(frame_bytes)
@@ -90,13 +193,16 @@ class LiveVisionStream:
                 "type": "processing_started",
                 "timestamp": current_time
             })
-            print(f"🚀 Starting Ollama analysis...")
+            logger.debug("Starting Ollama analysis")
             
             # Use NON-STREAMING detection (streaming has issues with empty think tokens)
-            print(f"📡 Calling ollama_service.detect_object_live...")
-            full_result = await ollama_service.detect_object_live(frame_bytes)
+            if shared is not None:
+                logger.debug("Joining shared detection for identical frame")
+                full_result = await asyncio.shield(shared)
+            else:
+                full_result = await self._detect_shared(frame_key, frame_bytes)
             
-            print(f"📝 Detection result: {full_result}")
+            logger.debug("Detection result: %s", full_result)
             
             # Check for skipped frame
             if full_result.get("skipped"):
@@ -137,18 +243,18 @@ class LiveVisionStream:
                 if session_id:
                     try:
                         await db_service.save_detected_item(session_id, full_result)
-                        print(f"✅ Saved detection result to session {session_id}")
+                        logger.debug("Saved detection result to session %s", session_id)
                     except Exception as e:
-                        print(f"Database save error: {e}")
+                        logger.warning("Database save error: %s", e)
                 
-                print(f"📤 Sending complete message with result")
+                logger.debug("Sending complete message with result")
                 await self.send_json(client_id, {
                     "type": "complete",
                     "result": full_result,
                     "confidence": confidence_pct
                 })
             else:
-                print(f"⚠️ Low confidence ({confidence_pct}%) and no valid detection data")
+                logger.debug("Low confidence (%d%%) and no valid detection data", confidence_pct)
                 await self.send_json(client_id, {
                     "type": "low_confidence",
                     "confidence": confidence_pct,
@@ -156,7 +262,7 @@ class LiveVisionStream:
                 })
         
         except Exception as e:
-            print(f"Frame processing error: {e}")
+            logger.exception("Frame processing error: %s", e)
             await self.send_json(client_id, {
                 "type": "error",
                 "message": f"Processing error: {str(e)}"
@@ -167,12 +273,24 @@ class LiveVisionStream:
 vision_stream = LiveVisionStream()
 
 
+async def _submit_frame(client_id: str, frame: str | bytes | memoryview, session_id: Optional[str]):
+    """Hand a frame to the client's consumer, telling the client when a waiting frame is dropped"""
+    if not vision_stream.enqueue_frame(client_id, frame, session_id):
+        logger.debug("Replaced waiting frame for client %s with a newer one", client_id)
+        await vision_stream.send_json(client_id, {
+            "type": "dropped",
+            "reason": "Replaced by a newer frame"
+        })
+
+
 @router.websocket("/ws/vision")
 async def websocket_vision_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for live video stream analysis.
     
-    Client sends:
+    Client sends a binary message, either framed:
+        <u8 type=1><u32 session_id length (little-endian)><session_id utf-8><JPEG bytes>
+    or the raw JPEG alone (saved to the last session_id seen), or the legacy JSON text message:
     {
         "type": "frame",
         "data": "base64 encoded JPEG frame",
@@ -187,23 +305,49 @@ async def websocket_vision_endpoint(websocket: WebSocket):
     """
     client_id = str(id(websocket))
     await vision_stream.connect(websocket, client_id)
+    session_id: Optional[str] = None
     
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
-            print(f"📨 Received message type: {data.get('type')}")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            if message.get("bytes") is not None:
+                # Binary frame - no base64 or JSON decoding needed
+                buf = message["bytes"]
+                frame_bytes: bytes | memoryview = buf
+                if not buf.startswith(_JPEG_MAGIC):
+                    # Framed message - slice the JPEG out without copying it
+                    if len(buf) < _FRAME_HEADER.size:
+                        continue
+                    frame_type, sid_len = _FRAME_HEADER.unpack_from(buf)
+                    if frame_type != BINARY_FRAME_TYPE:
+                        continue
+                    sid_end = _FRAME_HEADER.size + sid_len
+                    if sid_end > len(buf):
+                        continue
+                    if sid_len:
+                        # A malformed session id only drops this frame, not the connection
+                        try:
+                            session_id = buf[_FRAME_HEADER.size:sid_end].decode(errors="strict")
+                        except UnicodeDecodeError:
+                            continue
+                    frame_bytes = memoryview(buf)[sid_end:]
+                logger.debug("Received binary frame, size: %d bytes", len(frame_bytes))
+                await _submit_frame(client_id, frame_bytes, session_id)
+                continue
+            
+            data = orjson.loads(message.get("text") or "{}")
+            logger.debug("Received message type: %s", data.get("type"))
+            session_id = data.get("session_id", session_id)
             
             if data.get("type") == "frame":
                 # Process frame asynchronously (non-blocking)
                 frame_data = data.get("data", "")
-                session_id = data.get("session_id")
-                print(f"📷 Received frame, size: {len(frame_data)} chars")
-                
-                # Fire and forget - don't await
-                asyncio.create_task(
-                    vision_stream.process_frame(client_id, frame_data, session_id)
-                )
+                logger.debug("Received frame, size: %d chars", len(frame_data))
+                await _submit_frame(client_id, frame_data, session_id)
             
             elif data.get("type") == "ping":
                 # Keep-alive ping
@@ -212,5 +356,5 @@ async def websocket_vision_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         vision_stream.disconnect(client_id)
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.warning("WebSocket error: %s", e)
         vision_stream.disconnect(client_id)
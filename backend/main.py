@@ -2,23 +2,54 @@
 Right to Repair - FastAPI Backend
 Main application entry point
 """
+import asyncio
+import logging
+import logging.handlers
+import os
+import queue
+import sys
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from api.detect import router as detect_router
 from api.repair import router as repair_router
 from api.chat import router as chat_router
 from api.vision_stream import router as vision_stream_router
 from services.database import db_service
 from services.ollama_service import ollama_service
+from services.guide_extractor import guide_extractor
+from services.deep_search.fetcher import AsyncFetcher
+
+
+def _configure_logging() -> logging.handlers.QueueListener:
+    """
+    Route app logs through a queue so formatting/stdout writes happen on a listener thread.
+    Level comes from LOG_LEVEL (default INFO) - set DEBUG for per-frame/per-request traces.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    return logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database and model on startup"""
+    """Initialize database and model on startup, release pooled clients/connections on shutdown"""
+    log_listener = _configure_logging()
+    log_listener.start()
+    # Warmup pre-loads the model in the background so startup doesn't wait on it
+    # (best-effort: it logs and swallows its own failures, a DB init failure still aborts startup)
+    warmup_task = asyncio.create_task(ollama_service.warmup())
     await db_service.initialize()
-    await ollama_service.warmup()  # Pre-load model for faster first inference
     yield
+    warmup_task.cancel()
+    await asyncio.gather(AsyncFetcher.close(), guide_extractor.close(), db_service.close())
+    log_listener.stop()
 
 
 app = FastAPI(
@@ -37,6 +68,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON-heavy search/guide responses (HTTP only - websocket frames are untouched)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(detect_router, prefix="/api/detect", tags=["Detection"])
 app.include_router(repair_router, prefix="/api/repair", tags=["Repair"])
@@ -52,3 +86,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    # uvloop + httptools cut event-loop and HTTP parsing overhead (uvloop has no Windows support)
+    uvicorn.run(
+        "main:app",
+        host="127.0.0.1",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        limit_concurrency=1000,  # Shed load with 503s instead of queueing unbounded
+        timeout_keep_alive=30
+    )
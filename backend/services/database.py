@@ -1,27 +1,161 @@
 """
 Database Service - SQLite for chat history and repair sessions
 """
+import asyncio
 import aiosqlite
-import json
+import hashlib
+import pybase64
+import orjson
+import sqlite3
 import uuid
-from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 from pathlib import Path
 
 DATABASE_PATH = Path(__file__).parent.parent / "repair_history.db"
+MAX_TITLE_LENGTH = 30
+
+# Applied once to the shared connection: WAL lets reads proceed during writes,
+# NORMAL sync is durable in WAL mode with far fewer fsyncs, mmap serves reads
+# straight from the OS page cache without read() syscalls
+_PRAGMAS = (
+    "PRAGMA page_size=8192",  # Only takes effect on a brand-new database file
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=30000",
+)
+
+# Hot read paths: messages/detected items by session in time order, sessions by recency
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_messages_session_created ON messages(session_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_detected_session_created ON detected_items(session_id, created_at DESC)",
+    # Text-only messages for the sliding context window (is_image is a generated column)
+    "CREATE INDEX IF NOT EXISTS idx_messages_text ON messages(session_id, created_at DESC) WHERE is_image = 0",
+    "CREATE INDEX IF NOT EXISTS idx_message_images_sha ON message_images(sha256)",
+)
+OPTIMIZE_INTERVAL = 15 * 60  # seconds between PRAGMA optimize runs
+
+# Statements as module constants - the same SQL text is reused on every call,
+# so sqlite3's per-connection statement cache skips re-parsing/planning
+# Local ISO-8601 timestamp computed by SQLite - same format the Python side used to send
+_SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+_SQL_INSERT_SESSION = "INSERT INTO sessions (id, title) VALUES (?, ?)"
+# Explicit column lists (no SELECT *) - only the fields callers actually read
+_SESSION_COLUMNS = "id, title, created_at, updated_at"
+_SQL_SELECT_SESSIONS = f"SELECT {_SESSION_COLUMNS} FROM sessions ORDER BY updated_at DESC LIMIT ?"
+_SQL_SELECT_SESSION = f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE id = ?"
+_SQL_UPDATE_SESSION_TITLE = f"UPDATE sessions SET title = ?, updated_at = {_SQL_NOW} WHERE id = ?"
+_SQL_DELETE_SESSION_MESSAGES = "DELETE FROM messages WHERE session_id = ?"
+_SQL_DELETE_SESSION_ITEMS = "DELETE FROM detected_items WHERE session_id = ?"
+_SQL_DELETE_SESSION = "DELETE FROM sessions WHERE id = ?"
+_SQL_INSERT_MESSAGE = """INSERT INTO messages (id, session_id, role, content, images_count, metadata)
+    SELECT ?, ?, ?, ?, ?, ?
+    WHERE EXISTS (SELECT 1 FROM sessions WHERE id = ?)"""
+# Image bytes live outside the messages rows, deduplicated by content hash
+_SQL_INSERT_IMAGE_BLOB = "INSERT OR IGNORE INTO image_blobs (sha256, data) VALUES (?, ?)"
+_SQL_INSERT_MESSAGE_IMAGE = "INSERT INTO message_images (message_id, sha256) VALUES (?, ?)"
+_SQL_SELECT_MESSAGE_IMAGE = """SELECT b.data FROM message_images mi
+    JOIN image_blobs b ON b.sha256 = mi.sha256
+    WHERE mi.message_id = ?"""
+_SQL_DELETE_SESSION_IMAGES = """DELETE FROM message_images
+    WHERE message_id IN (SELECT id FROM messages WHERE session_id = ?)"""
+_SQL_DELETE_ORPHAN_BLOBS = """DELETE FROM image_blobs
+    WHERE NOT EXISTS (SELECT 1 FROM message_images mi WHERE mi.sha256 = image_blobs.sha256)"""
+_SQL_TOUCH_SESSION = f"UPDATE sessions SET updated_at = {_SQL_NOW} WHERE id = ?"
+_SQL_SELECT_MESSAGES = """SELECT m.id, m.session_id, m.role, m.content, m.images_count, m.metadata, m.created_at,
+    mi.message_id IS NOT NULL AS has_image
+    FROM messages m LEFT JOIN message_images mi ON mi.message_id = m.id
+    WHERE m.session_id = ? ORDER BY m.created_at ASC"""
+_SQL_SELECT_ITEM_ID = "SELECT id FROM detected_items WHERE session_id = ?"
+_SQL_UPDATE_ITEM = """UPDATE detected_items
+    SET object = ?, brand = ?, model = ?, serial_number = ?,
+    condition = ?, issues = ?, description = ?
+    WHERE session_id = ?"""
+_SQL_INSERT_ITEM = """INSERT INTO detected_items
+    (id, session_id, object, brand, model, serial_number, condition, issues, description)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+_SQL_SELECT_ITEM = """SELECT object, brand, model, serial_number, condition, issues, description
+    FROM detected_items WHERE session_id = ? ORDER BY created_at DESC LIMIT 1"""
+_SQL_SELECT_RECENT_MESSAGES = """SELECT role, content FROM messages
+    WHERE session_id = ? AND is_image = 0
+    ORDER BY created_at DESC LIMIT ?"""
+_SQL_SELECT_CONTEXT = "SELECT key_facts, decisions_made, topics_discussed FROM conversation_context WHERE session_id = ?"
+CONTEXT_LIST_LIMIT = 10  # Most recent entries kept per conversation_context list
+
+
+def _session_dict(row: tuple) -> dict:
+    """Build a session dict from a _SESSION_COLUMNS row"""
+    return {"id": row[0], "title": row[1], "created_at": row[2], "updated_at": row[3]}
+
+
+def _message_dict(row: tuple) -> dict:
+    """Build a message dict from a _SQL_SELECT_MESSAGES row"""
+    return {
+        "id": row[0],
+        "session_id": row[1],
+        "role": row[2],
+        "content": row[3],
+        "images_count": row[4],
+        "metadata": orjson.loads(row[5]) if row[5] else None,
+        "created_at": row[6],
+        "has_image": bool(row[7])
+    }
+
+
+def _append_capped(column: str, param: str) -> str:
+    """SQL expression appending :param to a JSON array column (skipping NULLs/duplicates), keeping the last entries"""
+    current = f"coalesce({column}, '[]')"
+    appended = f"json_insert({current}, '$[#]', :{param})"
+    return f"""CASE WHEN :{param} IS NULL OR EXISTS (SELECT 1 FROM json_each({current}) WHERE value = :{param})
+        THEN {current}
+        ELSE (SELECT json_group_array(value) FROM json_each({appended})
+              WHERE key >= json_array_length({appended}) - {CONTEXT_LIST_LIMIT})
+    END"""
+
+
+# Append + dedupe + truncate runs inside SQLite (JSON1) - no read-modify-write round trip
+_SQL_UPSERT_CONTEXT = f"""INSERT INTO conversation_context (id, session_id, key_facts, decisions_made, topics_discussed, updated_at)
+    VALUES (:id, :session_id,
+        CASE WHEN :key_fact IS NULL THEN '[]' ELSE json_array(:key_fact) END,
+        CASE WHEN :decision IS NULL THEN '[]' ELSE json_array(:decision) END,
+        CASE WHEN :topic IS NULL THEN '[]' ELSE json_array(:topic) END,
+        {_SQL_NOW})
+    ON CONFLICT(session_id) DO UPDATE SET
+    key_facts = {_append_capped("key_facts", "key_fact")},
+    decisions_made = {_append_capped("decisions_made", "decision")},
+    topics_discussed = {_append_capped("topics_discussed", "topic")},
+    updated_at = excluded.updated_at"""
 
 
 class DatabaseService:
+    """SQLite access over one shared connection - initialize() must run first (app lifespan)"""
+    
     def __init__(self):
         self.db_path = DATABASE_PATH
-        self._initialized = False
+        # One long-lived connection, opened by initialize()
+        self._db: Optional[aiosqlite.Connection] = None
+        self._init_lock = asyncio.Lock()
+        # Serializes write transactions so concurrent writers never share an open transaction
+        self._write_lock = asyncio.Lock()
+        self._optimize_task: Optional[asyncio.Task] = None
     
     async def initialize(self):
-        """Create tables if they don't exist"""
-        if self._initialized:
+        """Open the shared connection and create tables if they don't exist"""
+        if self._db is not None:
             return
         
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._init_lock:
+            if self._db is not None:
+                return
+            
+            # Rows stay plain tuples - readers build their dicts positionally
+            db = await aiosqlite.connect(self.db_path, cached_statements=256)
+            for pragma in _PRAGMAS:
+                await db.execute(pragma)
+            
             # Sessions table
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS sessions (
@@ -52,6 +186,30 @@ class DatabaseService:
             except:
                 pass  # Column already exists
             
+            # Image-placeholder flag computed from content, so the context query can use a partial index
+            try:
+                await db.execute(
+                    "ALTER TABLE messages ADD COLUMN is_image INTEGER "
+                    "GENERATED ALWAYS AS (content LIKE '[Image%]') VIRTUAL"
+                )
+            except:
+                pass  # Column already exists
+            
+            # Image payloads as raw BLOBs, looked up lazily by message id
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS image_blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS message_images (
+                    message_id TEXT PRIMARY KEY REFERENCES messages(id) ON DELETE CASCADE,
+                    sha256 TEXT NOT NULL REFERENCES image_blobs(sha256)
+                )
+            """)
+            await self._migrate_image_data(db)
+            
             # Detected items table
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS detected_items (
@@ -80,70 +238,91 @@ class DatabaseService:
                 )
             """)
             
+            for index in _INDEXES:
+                await db.execute(index)
+            
             await db.commit()
-        
-        self._initialized = True
+            self._db = db
+            self._optimize_task = asyncio.create_task(self._optimize_periodically())
+    
+    @staticmethod
+    async def _migrate_image_data(db: aiosqlite.Connection):
+        """Move legacy base64 data URLs from messages.image_data into image_blobs"""
+        cursor = await db.execute("SELECT id, image_data FROM messages WHERE image_data IS NOT NULL")
+        for message_id, image_data in await cursor.fetchall():
+            image = pybase64.b64decode(image_data.partition(",")[2] or image_data)
+            sha256 = hashlib.sha256(image).hexdigest()
+            await db.execute(_SQL_INSERT_IMAGE_BLOB, (sha256, image))
+            await db.execute("INSERT OR IGNORE INTO message_images (message_id, sha256) VALUES (?, ?)", (message_id, sha256))
+        await db.execute("UPDATE messages SET image_data = NULL WHERE image_data IS NOT NULL")
+    
+    async def _optimize_periodically(self):
+        """Keep query planner statistics fresh for long-running servers"""
+        while True:
+            await asyncio.sleep(OPTIMIZE_INTERVAL)
+            async with self._write_lock:
+                await self._db.execute("PRAGMA optimize")
+    
+    async def close(self):
+        """Close the shared connection"""
+        if self._optimize_task is not None:
+            self._optimize_task.cancel()
+            self._optimize_task = None
+        if self._db is not None:
+            async with self._write_lock:
+                await self._db.execute("PRAGMA optimize")
+            await self._db.close()
+            self._db = None
     
     async def create_session(self, title: str = "New Repair") -> str:
         """Create a new chat session"""
-        await self.initialize()
         session_id = str(uuid.uuid4())
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT INTO sessions (id, title) VALUES (?, ?)",
+        async with self._write_lock:
+            await self._db.execute(
+                _SQL_INSERT_SESSION,
                 (session_id, title)
             )
-            await db.commit()
+            await self._db.commit()
         
         return session_id
     
     async def get_sessions(self, limit: int = 20) -> list:
         """Get recent sessions"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                "SELECT * FROM sessions ORDER BY updated_at DESC LIMIT ?",
-                (limit,)
-            )
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        cursor = await self._db.execute(
+            _SQL_SELECT_SESSIONS,
+            (limit,)
+        )
+        rows = await cursor.fetchall()
+        return [_session_dict(row) for row in rows]
     
     async def get_session(self, session_id: str) -> Optional[dict]:
         """Get a single session"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                "SELECT * FROM sessions WHERE id = ?",
-                (session_id,)
-            )
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        cursor = await self._db.execute(
+            _SQL_SELECT_SESSION,
+            (session_id,)
+        )
+        row = await cursor.fetchone()
+        return _session_dict(row) if row else None
     
     async def update_session_title(self, session_id: str, title: str):
-        """Update session title"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "UPDATE sessions SET title = ?, updated_at = ? WHERE id = ?",
-                (title, datetime.now().isoformat(), session_id)
+        """Update session title (truncated to MAX_TITLE_LENGTH)"""
+        async with self._write_lock:
+            await self._db.execute(
+                _SQL_UPDATE_SESSION_TITLE,
+                (title[:MAX_TITLE_LENGTH], session_id)
             )
-            await db.commit()
+            await self._db.commit()
     
     async def delete_session(self, session_id: str):
         """Delete a session and all its messages"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
-            await db.execute("DELETE FROM detected_items WHERE session_id = ?", (session_id,))
-            await db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
-            await db.commit()
+        async with self._write_lock:
+            await self._db.execute(_SQL_DELETE_SESSION_IMAGES, (session_id,))
+            await self._db.execute(_SQL_DELETE_ORPHAN_BLOBS)
+            await self._db.execute(_SQL_DELETE_SESSION_MESSAGES, (session_id,))
+            await self._db.execute(_SQL_DELETE_SESSION_ITEMS, (session_id,))
+            await self._db.execute(_SQL_DELETE_SESSION, (session_id,))
+            await self._db.commit()
     
     async def add_message(
         self,
@@ -151,47 +330,107 @@ class DatabaseService:
         role: str,
         content: str,
         images_count: int = 0,
-        image_data: Optional[str] = None,
+        image: Optional[bytes] = None,
         metadata: Optional[dict] = None
-    ) -> str:
-        """Add a message to a session"""
-        await self.initialize()
+    ) -> Optional[str]:
+        """Add a message to a session (returns None if the session doesn't exist)"""
         message_id = str(uuid.uuid4())
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """INSERT INTO messages (id, session_id, role, content, images_count, image_data, metadata)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (message_id, session_id, role, content, images_count, image_data,
-                 json.dumps(metadata) if metadata else None)
-            )
-            # Update session timestamp
-            await db.execute(
-                "UPDATE sessions SET updated_at = ? WHERE id = ?",
-                (datetime.now().isoformat(), session_id)
-            )
-            await db.commit()
+        async with self._write_lock:
+            # Take the write lock up front - insert + timestamp land in one transaction/fsync
+            await self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Existence check folded into the insert - no separate session lookup needed
+                cursor = await self._db.execute(
+                    _SQL_INSERT_MESSAGE,
+                    (message_id, session_id, role, content, images_count,
+                     orjson.dumps(metadata).decode() if metadata else None, session_id)
+                )
+                if cursor.rowcount == 0:
+                    await self._db.rollback()
+                    return None
+                if image:
+                    await self._insert_image(message_id, image)
+                # Update session timestamp (same transaction - one commit for both)
+                await self._db.execute(
+                    _SQL_TOUCH_SESSION,
+                    (session_id,)
+                )
+                await self._db.commit()
+            except BaseException:
+                # Never leave the shared connection inside an open transaction
+                await self._db.rollback()
+                raise
         
         return message_id
     
+    async def add_messages_bulk(self, session_id: str, messages: list[dict]) -> list[str]:
+        """
+        Add several messages to a session in one transaction (returns [] if the session doesn't exist)
+        Each message dict takes the add_message fields: role, content, images_count, image, metadata
+        """
+        if not messages:
+            return []
+        
+        message_ids = [str(uuid.uuid4()) for _ in messages]
+        rows = [
+            (message_id, session_id, msg["role"], msg["content"], msg.get("images_count", 0),
+             orjson.dumps(msg["metadata"]).decode() if msg.get("metadata") else None, session_id)
+            for message_id, msg in zip(message_ids, messages)
+        ]
+        
+        async with self._write_lock:
+            await self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = await self._db.executemany(_SQL_INSERT_MESSAGE, rows)
+                if cursor.rowcount == 0:
+                    await self._db.rollback()
+                    return []
+                for message_id, msg in zip(message_ids, messages):
+                    if msg.get("image"):
+                        await self._insert_image(message_id, msg["image"])
+                # One timestamp update for the whole batch
+                await self._db.execute(
+                    _SQL_TOUCH_SESSION,
+                    (session_id,)
+                )
+                await self._db.commit()
+            except BaseException:
+                # Never leave the shared connection inside an open transaction
+                await self._db.rollback()
+                raise
+        
+        return message_ids
+    
+    async def _insert_image(self, message_id: str, image: bytes):
+        """Store image bytes for a message (caller holds the write transaction)"""
+        sha256 = hashlib.sha256(image).hexdigest()
+        await self._db.execute(_SQL_INSERT_IMAGE_BLOB, (sha256, sqlite3.Binary(image)))
+        await self._db.execute(_SQL_INSERT_MESSAGE_IMAGE, (message_id, sha256))
+    
+    async def get_message_image(self, message_id: str) -> Optional[bytes]:
+        """Get the raw image bytes attached to a message"""
+        cursor = await self._db.execute(
+            _SQL_SELECT_MESSAGE_IMAGE,
+            (message_id,)
+        )
+        row = await cursor.fetchone()
+        return row[0] if row else None
+    
     async def get_messages(self, session_id: str) -> list:
         """Get all messages for a session"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                "SELECT * FROM messages WHERE session_id = ? ORDER BY created_at ASC",
-                (session_id,)
-            )
-            rows = await cursor.fetchall()
-            messages = []
-            for row in rows:
-                msg = dict(row)
-                if msg.get('metadata'):
-                    msg['metadata'] = json.loads(msg['metadata'])
-                messages.append(msg)
-            return messages
+        cursor = await self._db.execute(
+            _SQL_SELECT_MESSAGES,
+            (session_id,)
+        )
+        rows = await cursor.fetchall()
+        return [_message_dict(row) for row in rows]
+    
+    async def iter_messages(self, session_id: str) -> AsyncIterator[dict]:
+        """Stream the messages for a session without materializing the whole history"""
+        async with self._db.execute(_SQL_SELECT_MESSAGES, (session_id,)) as cursor:
+            async for row in cursor:
+                yield _message_dict(row)
     
     async def save_detected_item(
         self,
@@ -199,12 +438,10 @@ class DatabaseService:
         detection_result: dict
     ) -> str:
         """Save or update a detected item (upsert)"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write_lock:
             # Check if item exists for this session
-            cursor = await db.execute(
-                "SELECT id FROM detected_items WHERE session_id = ?",
+            cursor = await self._db.execute(
+                _SQL_SELECT_ITEM_ID,
                 (session_id,)
             )
             existing = await cursor.fetchone()
@@ -212,18 +449,15 @@ class DatabaseService:
             if existing:
                 # Update existing item
                 item_id = existing[0]
-                await db.execute(
-                    """UPDATE detected_items 
-                       SET object = ?, brand = ?, model = ?, serial_number = ?, 
-                           condition = ?, issues = ?, description = ?
-                       WHERE session_id = ?""",
+                await self._db.execute(
+                    _SQL_UPDATE_ITEM,
                     (
                         detection_result.get('object', ''),
                         detection_result.get('brand', ''),
                         detection_result.get('model', ''),
                         detection_result.get('serial_number', ''),
                         detection_result.get('condition', ''),
-                        json.dumps(detection_result.get('issues', [])),
+                        orjson.dumps(detection_result.get('issues', [])).decode(),
                         detection_result.get('description', ''),
                         session_id
                     )
@@ -231,10 +465,8 @@ class DatabaseService:
             else:
                 # Insert new item
                 item_id = str(uuid.uuid4())
-                await db.execute(
-                    """INSERT INTO detected_items 
-                       (id, session_id, object, brand, model, serial_number, condition, issues, description)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                await self._db.execute(
+                    _SQL_INSERT_ITEM,
                     (
                         item_id,
                         session_id,
@@ -243,66 +475,59 @@ class DatabaseService:
                         detection_result.get('model', ''),
                         detection_result.get('serial_number', ''),
                         detection_result.get('condition', ''),
-                        json.dumps(detection_result.get('issues', [])),
+                        orjson.dumps(detection_result.get('issues', [])).decode(),
                         detection_result.get('description', '')
                     )
                 )
-            await db.commit()
+            await self._db.commit()
         
         return item_id
     
     async def get_detected_item(self, session_id: str) -> Optional[dict]:
         """Get the detected item for a session"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                "SELECT * FROM detected_items WHERE session_id = ? ORDER BY created_at DESC LIMIT 1",
-                (session_id,)
-            )
-            row = await cursor.fetchone()
-            if row:
-                item = dict(row)
-                if item.get('issues'):
-                    item['issues'] = json.loads(item['issues'])
-                return item
-            return None
+        cursor = await self._db.execute(
+            _SQL_SELECT_ITEM,
+            (session_id,)
+        )
+        row = await cursor.fetchone()
+        if row:
+            obj, brand, model, serial_number, condition, issues, description = row
+            return {
+                'object': obj,
+                'brand': brand,
+                'model': model,
+                'serial_number': serial_number,
+                'condition': condition,
+                'issues': orjson.loads(issues) if issues else issues,
+                'description': description
+            }
+        return None
     
     async def get_recent_messages(self, session_id: str, limit: int = 6) -> list:
         """Get last N messages for sliding window context (efficient)"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                """SELECT role, content FROM messages 
-                   WHERE session_id = ? AND content NOT LIKE '[Image%]'
-                   ORDER BY created_at DESC LIMIT ?""",
-                (session_id, limit)
-            )
-            rows = await cursor.fetchall()
-            # Reverse to get chronological order
-            return [{"role": r["role"], "content": r["content"]} for r in reversed(rows)]
+        cursor = await self._db.execute(
+            _SQL_SELECT_RECENT_MESSAGES,
+            (session_id, limit)
+        )
+        rows = await cursor.fetchall()
+        # Reverse to get chronological order
+        return [{"role": r[0], "content": r[1]} for r in reversed(rows)]
     
     async def get_conversation_context(self, session_id: str) -> Optional[dict]:
         """Get stored conversation context (key facts)"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                "SELECT * FROM conversation_context WHERE session_id = ?",
-                (session_id,)
-            )
-            row = await cursor.fetchone()
-            if row:
-                ctx = dict(row)
-                ctx['key_facts'] = json.loads(ctx.get('key_facts', '[]'))
-                ctx['decisions_made'] = json.loads(ctx.get('decisions_made', '[]'))
-                ctx['topics_discussed'] = json.loads(ctx.get('topics_discussed', '[]'))
-                return ctx
-            return None
+        cursor = await self._db.execute(
+            _SQL_SELECT_CONTEXT,
+            (session_id,)
+        )
+        row = await cursor.fetchone()
+        if row:
+            key_facts, decisions_made, topics_discussed = row
+            return {
+                'key_facts': orjson.loads(key_facts or '[]'),
+                'decisions_made': orjson.loads(decisions_made or '[]'),
+                'topics_discussed': orjson.loads(topics_discussed or '[]')
+            }
+        return None
     
     async def update_conversation_context(
         self,
@@ -312,46 +537,19 @@ class DatabaseService:
         topic: Optional[str] = None
     ):
         """Update conversation context with new facts (append-only, no LLM needed)"""
-        await self.initialize()
-        
-        async with aiosqlite.connect(self.db_path) as db:
-            # Get existing or create new
-            cursor = await db.execute(
-                "SELECT key_facts, decisions_made, topics_discussed FROM conversation_context WHERE session_id = ?",
-                (session_id,)
-            )
-            row = await cursor.fetchone()
-            
-            if row:
-                key_facts = json.loads(row[0] or '[]')
-                decisions = json.loads(row[1] or '[]')
-                topics = json.loads(row[2] or '[]')
-            else:
-                key_facts, decisions, topics = [], [], []
-            
-            # Append new items (keep last 10 of each to limit size)
-            if key_fact and key_fact not in key_facts:
-                key_facts.append(key_fact)
-                key_facts = key_facts[-10:]
-            if decision and decision not in decisions:
-                decisions.append(decision)
-                decisions = decisions[-10:]
-            if topic and topic not in topics:
-                topics.append(topic)
-                topics = topics[-10:]
-            
-            # Upsert
-            await db.execute(
-                """INSERT INTO conversation_context (id, session_id, key_facts, decisions_made, topics_discussed, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?)
-                   ON CONFLICT(session_id) DO UPDATE SET
-                   key_facts = excluded.key_facts,
-                   decisions_made = excluded.decisions_made,
-                   topics_discussed = excluded.topics_discussed,
-                   updated_at = excluded.updated_at""",
-                (str(uuid.uuid4()), session_id, json.dumps(key_facts), json.dumps(decisions), json.dumps(topics), datetime.now().isoformat())
+        async with self._write_lock:
+            await self._db.execute(
+                _SQL_UPSERT_CONTEXT,
+                {
+                    "id": str(uuid.uuid4()),
+                    "session_id": session_id,
+                    # Empty strings are treated like None (nothing to append)
+                    "key_fact": key_fact or None,
+                    "decision": decision or None,
+                    "topic": topic or None
+                }
             )
-            await db.commit()
+            await self._db.commit()
 
 
 # Singleton instance
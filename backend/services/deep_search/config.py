@@ -2,6 +2,7 @@
 Configuration for Deep Search Tool
 Uses web scraping only - no API keys needed!
 """
+import os
 
 
 class Config:
@@ -11,6 +12,20 @@ class Config:
     DEFAULT_MAX_RESULTS: int = 10
     REQUEST_TIMEOUT: int = 15
     MAX_CONCURRENT_REQUESTS: int = 10
+    MAX_REQUESTS_PER_HOST: int = int(os.getenv("MAX_REQUESTS_PER_HOST", "4"))  # DuckDuckGo serves both Reddit and web search
+    MAX_RETRIES: int = 2  # Retries on 429/503, with exponential backoff
+    RETRY_BACKOFF: float = 0.5  # First retry delay (seconds), doubled per attempt
+    RETRY_BACKOFF_MAX: float = 4.0
+    SOURCE_TIMEOUT: float = 8.0  # Per-source budget before partial results are returned
+    RESULT_CACHE_TTL: int = 60 * 60  # Per-engine result lists (seconds)
+    DDG_CACHE_TTL: int = int(os.getenv("DDG_CACHE_TTL", "300"))  # Parsed DuckDuckGo pages, shared across engines
+    EMPTY_RESULT_CACHE_TTL: int = 60  # Empty/failed searches, so a failing upstream isn't hammered
+    TRANSCRIPT_CACHE_TTL: int = 7 * 24 * 60 * 60  # YouTube transcripts rarely change
+    TRANSCRIPT_MISS_TTL: int = 60 * 60  # Videos without a transcript aren't re-queried for an hour
+    TRANSCRIPT_TIMEOUT: float = 2.5  # Per-video budget so one slow lookup can't stall the rest
+    TRANSCRIPT_TIMEOUT_TTL: int = 10 * 60  # Timed-out videos are retried sooner than real misses
+    TRANSCRIPT_MAX_CHARS: int = 500
+    VIDEO_INFO_CACHE_TTL: int = 60 * 60  # oEmbed metadata for a video is effectively static
     
     # User agent for web scraping
     USER_AGENT: str = (
@@ -0,0 +1,58 @@
+"""
+DuckDuckGo HTML search shared by the Reddit and web engines
+Each query's results page is fetched and parsed once, then served to every engine asking for it
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from urllib.parse import quote_plus
+from cachetools import TTLCache
+
+from ..singleflight import single_flight
+from .config import config
+from .ddg_parser import parse_ddg_results
+from .fetcher import fetcher
+
+# Results pages are parsed here rather than on the default executor, so parses don't queue behind other thread work
+_parse_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ddg")
+
+
+class DDGClient:
+    """Cached, coalesced DuckDuckGo searches returning (title, link, snippet) tuples"""
+    
+    # query -> parsed results page (callers slice/filter, so it's shared as-is)
+    _cache: TTLCache = TTLCache(maxsize=256, ttl=config.DDG_CACHE_TTL)
+    _inflight: dict[str, asyncio.Task] = {}  # query -> running fetch + parse
+    _misses: TTLCache = TTLCache(maxsize=256, ttl=config.EMPTY_RESULT_CACHE_TTL)  # queries that failed or came back empty
+    
+    def __init__(self):
+        self.fetcher = fetcher
+    
+    async def search(self, query: str) -> List[Tuple[str, str, str]]:
+        """All results on the first DuckDuckGo page for query"""
+        cached = self._cache.get(query)
+        if cached is not None:
+            return cached
+        if query in self._misses:
+            return []
+        
+        return await single_flight(self._inflight, query, lambda: self._search(query))
+    
+    async def _search(self, query: str) -> List[Tuple[str, str, str]]:
+        """Fetch and parse one results page, caching it (failures and empty pages only briefly)"""
+        html = await self.fetcher.fetch(f"https://html.duckduckgo.com/html/?q={quote_plus(query)}")
+        if not html:
+            self._misses[query] = True
+            return []
+        
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(_parse_pool, parse_ddg_results, html)
+        if results:
+            self._cache[query] = results
+        else:
+            self._misses[query] = True
+        return results
+
+
+# Shared by all engines
+ddg = DDGClient()
@@ -0,0 +1,41 @@
+"""
+DuckDuckGo HTML results parser shared by the Reddit and web engines
+Parsing is CPU-bound - call it from a worker thread so the event loop keeps serving fetches
+"""
+from typing import List, Optional, Tuple
+from lxml import etree, html as lxml_html
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one token of the class attribute (like a CSS .name selector)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Compiled once - lxml's C tree walk instead of BeautifulSoup's Python object model
+_RESULTS = etree.XPath(f"//*[{_has_class('result')}]")
+_TITLE_LINK = etree.XPath(f".//*[{_has_class('result__title')}]//a")
+_SNIPPET = etree.XPath(f".//*[{_has_class('result__snippet')}]")
+
+
+def _text(element) -> str:
+    """Concatenated stripped text of an element (matches BeautifulSoup's get_text(strip=True))"""
+    return "".join(part.strip() for part in element.itertext())
+
+
+def parse_ddg_results(html: str, limit: Optional[int] = None) -> List[Tuple[str, str, str]]:
+    """Parse up to `limit` (default all) results from a DuckDuckGo HTML page as (title, link, snippet) tuples"""
+    tree = lxml_html.fromstring(html)
+    parsed = []
+    
+    for result in _RESULTS(tree)[:limit]:
+        title_links = _TITLE_LINK(result)
+        if title_links:
+            title_elem = title_links[0]
+            snippets = _SNIPPET(result)
+            parsed.append((
+                _text(title_elem),
+                title_elem.get('href', ''),
+                _text(snippets[0]) if snippets else ""
+            ))
+    
+    return parsed
@@ -2,49 +2,123 @@
 Async HTTP Fetcher utility for web scraping
 """
 import asyncio
+import logging
 import httpx
+import orjson
 from typing import Optional
+from urllib.parse import urlsplit
+from cachetools import TTLCache
 from .config import config
 
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL = 120  # seconds a successful response is reused
+RETRY_STATUSES = frozenset({429, 503})  # Rate limited / temporarily unavailable
+
 
 class AsyncFetcher:
     """Async HTTP client for web scraping"""
     
+    # One connection pool shared by every engine's fetcher
+    _shared_client: Optional[httpx.AsyncClient] = None
+    # Caps in-flight requests without tying up pool slots - slow hosts can't starve fast ones
+    _request_slots = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
+    # Per-host caps so one busy host (DuckDuckGo) can't take every slot
+    _host_slots: dict[str, asyncio.Semaphore] = {}
+    # Identical concurrent fetches share one request; recent responses are reused briefly
+    _inflight: dict[tuple[str, bool], asyncio.Future] = {}
+    _cache: TTLCache = TTLCache(maxsize=512, ttl=RESPONSE_CACHE_TTL)
+    
     def __init__(self):
         self.headers = {
             "User-Agent": config.USER_AGENT,
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.5",
         }
-        self._client: Optional[httpx.AsyncClient] = None
     
     async def get_client(self) -> httpx.AsyncClient:
-        """Get or create HTTP client"""
-        if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient(
+        """Get or create the shared HTTP client"""
+        client = AsyncFetcher._shared_client
+        if client is None or client.is_closed:
+            # HTTP/2 multiplexes concurrent requests to a host over one connection
+            client = AsyncFetcher._shared_client = httpx.AsyncClient(
+                http2=True,
                 headers=self.headers,
                 timeout=httpx.Timeout(config.REQUEST_TIMEOUT),
                 follow_redirects=True,
-                limits=httpx.Limits(max_connections=config.MAX_CONCURRENT_REQUESTS)
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
             )
-        return self._client
+        return client
     
     async def fetch(self, url: str, json_response: bool = False) -> Optional[str | dict]:
-        """Fetch a URL and return content"""
+        """Fetch a URL and return content (coalesced with identical in-flight fetches)"""
+        key = (url, json_response)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        result = None
+        try:
+            result = await self._fetch(url, json_response)
+        finally:
+            # Waiters get None (a failed fetch) if the leading caller is cancelled
+            future.set_result(result)
+            del self._inflight[key]
+        
+        if result is not None:
+            self._cache[key] = result
+        return result
+    
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        """Get the concurrency limiter for a URL's host"""
+        host = urlsplit(url).hostname or ""
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(config.MAX_REQUESTS_PER_HOST)
+        return slot
+    
+    @staticmethod
+    def _retry_delay(response: httpx.Response, attempt: int) -> float:
+        """Backoff before retrying a throttled request (honours a numeric Retry-After)"""
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), config.RETRY_BACKOFF_MAX)
+        return min(config.RETRY_BACKOFF * 2 ** attempt, config.RETRY_BACKOFF_MAX)
+    
+    async def _fetch(self, url: str, json_response: bool) -> Optional[str | dict]:
+        """Fetch a URL, retrying with backoff when the host throttles us"""
         try:
             client = await self.get_client()
-            response = await client.get(url)
+            for attempt in range(config.MAX_RETRIES + 1):
+                async with self._host_slot(url), self._request_slots:
+                    response = await client.get(url)
+                if response.status_code not in RETRY_STATUSES or attempt == config.MAX_RETRIES:
+                    break
+                # Slots are released while waiting
+                await asyncio.sleep(self._retry_delay(response, attempt))
             
             if response.status_code == 200:
                 if json_response:
-                    return response.json()
+                    return orjson.loads(response.content)
                 return response.text
         except Exception as e:
-            print(f"Fetch error for {url}: {e}")
+            logger.warning("Fetch error for %s: %s", url, e)
         
         return None
     
-    async def close(self):
-        """Close the HTTP client"""
-        if self._client and not self._client.is_closed:
-            await self._client.aclose()
+    @classmethod
+    async def close(cls):
+        """Close the shared HTTP client"""
+        client = cls._shared_client
+        if client and not client.is_closed:
+            await client.aclose()
+
+
+# Shared instance for the search engines
+fetcher = AsyncFetcher()
@@ -1,6 +1,10 @@
 """
-Pydantic models for search results
+Models for search queries and results
+The query is validated with Pydantic; results are built in bulk by the scrapers,
+so they are plain slotted dataclasses
 """
+import time
+from dataclasses import dataclass, field
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 from datetime import datetime
@@ -18,7 +22,8 @@ class SearchQuery(BaseModel):
     language: str = Field(default="en", description="Language code")
 
 
-class RedditResult(BaseModel):
+@dataclass(slots=True)
+class RedditResult:
     """Reddit search result"""
     title: str
     url: str
@@ -29,18 +34,28 @@ class RedditResult(BaseModel):
     author: str = ""
     created_utc: Optional[int] = None
     relevance: float = 0.0
+    
+    def to_dict(self) -> dict:
+        """Convert to dictionary"""
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
-class ForumResult(BaseModel):
+@dataclass(slots=True)
+class ForumResult:
     """Forum/Article search result"""
     title: str
     url: str
     source: str
     snippet: str = ""
     relevance: float = 0.0
+    
+    def to_dict(self) -> dict:
+        """Convert to dictionary"""
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
-class YouTubeResult(BaseModel):
+@dataclass(slots=True)
+class YouTubeResult:
     """YouTube video result"""
     title: str
     url: str
@@ -51,22 +66,29 @@ class YouTubeResult(BaseModel):
     thumbnail: str = ""
     transcript: str = ""
     relevance: float = 0.0
+    
+    def to_dict(self) -> dict:
+        """Convert to dictionary"""
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
-class SearchResults(BaseModel):
+@dataclass(slots=True)
+class SearchResults:
     """Aggregated search results"""
     query: str
-    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
-    results: Dict[str, List[Any]] = Field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)  # Unix time, formatted in to_dict
+    results: Dict[str, List[Any]] = field(default_factory=dict)
     total_results: int = 0
     search_time_ms: float = 0.0
+    timed_out: List[str] = field(default_factory=list)  # Sources cut off by the per-source timeout
     
     def to_dict(self) -> dict:
         """Convert to dictionary"""
         return {
             "query": self.query,
-            "timestamp": self.timestamp,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
             "results": self.results,
             "total_results": self.total_results,
-            "search_time_ms": self.search_time_ms
+            "search_time_ms": self.search_time_ms,
+            "timed_out": self.timed_out
         }
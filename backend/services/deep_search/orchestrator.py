@@ -7,14 +7,24 @@ Key optimizations:
 4. Cached engines (singleton pattern)
 """
 import asyncio
+import hashlib
+import logging
+import re
+import string
 import time
-from typing import List, Dict, Any, Optional
+from itertools import islice, repeat
+from typing import AsyncIterator, List, Dict, Any, Optional
+
+from cachetools import TTLCache
 
 from .reddit_search import create_reddit_search
 from .web_search import create_web_search
 from .youtube_search import create_youtube_search
+from .config import config
 from .models import SearchQuery, SearchResults
 
+logger = logging.getLogger(__name__)
+
 
 class QueryOptimizer:
     """Optimizes search queries for better results"""
@@ -22,6 +32,12 @@ class QueryOptimizer:
     STOP_WORDS = {'the', 'a', 'an', 'is', 'it', 'to', 'of', 'and', 'in', 'for', 'on', 'my', 'i'}
     REPAIR_KEYWORDS = {'fix', 'repair', 'solve', 'solution', 'broken', 'not working',
                        'issue', 'problem', 'error', 'how to', 'help', 'stuck'}
+    PROBLEM_INDICATORS = {'not', 'broken', 'stopped', 'wont', "won't", "doesn't",
+                          'cant', "can't", 'failed', 'error', 'issue'}
+    
+    # One C-level scan per keyword set (substring match, same as the old any(...) loops)
+    REPAIR_RE = re.compile('|'.join(map(re.escape, sorted(REPAIR_KEYWORDS))))
+    PROBLEM_RE = re.compile('|'.join(map(re.escape, sorted(PROBLEM_INDICATORS))))
     
     @classmethod
     def optimize(cls, query: str, context: Optional[str] = None) -> str:
@@ -34,19 +50,17 @@ class QueryOptimizer:
             query = f"{query} {context}"
         
         # Extract key terms (remove stop words for search engines)
-        words = query.lower().split()
+        query_lower = query.lower()
+        words = query_lower.split()
         key_terms = [w for w in words if w not in cls.STOP_WORDS and len(w) > 2]
         
         # Detect if it's a repair query and enhance
-        query_lower = query.lower()
-        is_repair_query = any(kw in query_lower for kw in cls.REPAIR_KEYWORDS)
+        is_repair_query = cls.REPAIR_RE.search(query_lower) is not None
         
         # If no repair intent detected, add "how to fix" for better results
         if not is_repair_query and len(key_terms) >= 2:
             # Check if it seems like a problem description
-            problem_indicators = ['not', 'broken', 'stopped', 'wont', "won't", "doesn't", 
-                                  'cant', "can't", 'failed', 'error', 'issue']
-            if any(ind in query_lower for ind in problem_indicators):
+            if cls.PROBLEM_RE.search(query_lower):
                 query = f"how to fix {query}"
         
         return query
@@ -55,19 +69,23 @@ class QueryOptimizer:
 class ResultRanker:
     """Smart ranking of search results for relevance"""
     
+    # str.translate strips punctuation in one C pass - cheaper than a regex on short titles
+    PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+    
     @classmethod
     def rank_and_dedupe(cls, results: Dict[str, List[dict]], query: str) -> Dict[str, List[dict]]:
         """Rank results by relevance and remove duplicates"""
-        query_terms = set(query.lower().split())
-        seen_titles = set()
+        # Tokenized once per search; titles are matched against it without building sets
+        query_terms = frozenset(query.lower().split())
+        seen_titles: set[bytes] = set()
         
         for source, items in results.items():
             unique_items = []
             
             for item in items:
-                # Deduplication by title similarity
-                title = item.get('title', '').lower()
-                title_key = cls._normalize_title(title)
+                # Deduplication by title similarity (tokens shared with the title match below)
+                title_tokens = item.get('title', '').lower().split()
+                title_key = cls._normalize_title(title_tokens)
                 
                 if title_key in seen_titles:
                     continue
@@ -77,8 +95,7 @@ class ResultRanker:
                 relevance = item.get('relevance', 0.5)
                 
                 # Title match boost
-                title_terms = set(title.split())
-                title_match = len(query_terms & title_terms) / len(query_terms) if query_terms else 0
+                title_match = len(query_terms.intersection(title_tokens)) / len(query_terms) if query_terms else 0
                 relevance = relevance * 0.6 + title_match * 0.4
                 
                 # Transcript boost for YouTube (if contains query terms)
@@ -98,13 +115,12 @@ class ResultRanker:
         return results
     
     @classmethod
-    def _normalize_title(cls, title: str) -> str:
-        """Normalize title for deduplication"""
-        # Remove common words and punctuation
-        import re
-        title = re.sub(r'[^\w\s]', '', title.lower())
-        words = [w for w in title.split() if len(w) > 3]
-        return ' '.join(sorted(words[:5]))
+    def _normalize_title(cls, title_tokens: List[str]) -> bytes:
+        """Normalize lowercased title tokens for deduplication (8-byte digest of the key words)"""
+        # Remove common words and punctuation (punctuation-only tokens shrink below the length cut);
+        # stops translating once the first five key words are found
+        words = islice((w for w in map(str.translate, title_tokens, repeat(cls.PUNCTUATION_TABLE)) if len(w) > 3), 5)
+        return hashlib.blake2b(' '.join(sorted(words)).encode(), digest_size=8).digest()
 
 
 class SearchOrchestrator:
@@ -131,6 +147,42 @@ class SearchOrchestrator:
         self.query_optimizer = QueryOptimizer()
         self.ranker = ResultRanker()
     
+    async def _search_source(self, name: str, engine, query: str, max_results: int) -> tuple[str, List[Dict[str, Any]], bool]:
+        """
+        Run a single engine search with a timeout, returning (name, results, timed_out)
+        Errors and timeouts yield no results instead of failing the other sources
+        """
+        # OPTIMIZATION 3: Use timeouts so a slow source can't hold back the others
+        try:
+            async with asyncio.timeout(config.SOURCE_TIMEOUT):
+                results = await engine.search(query, max_results)
+        except TimeoutError:
+            logger.warning("Timeout in %s search", name)
+            return name, [], True
+        except Exception as e:
+            logger.warning("Error in %s search: %s", name, e)
+            return name, [], False
+        
+        # Convert to dict for JSON serialization
+        return name, [r.to_dict() for r in results], False
+    
+    async def iter_sources(self, query: str, engines: Dict[str, Any], max_results: int) -> AsyncIterator[tuple[str, List[Dict[str, Any]], bool]]:
+        """
+        Run all engines concurrently, yielding (name, results, timed_out) as each finishes
+        Fast sources are available immediately instead of waiting on the slowest one
+        """
+        tasks = [
+            asyncio.create_task(self._search_source(name, engine, query, max_results))
+            for name, engine in engines.items()
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early (or was cancelled) - don't leave searches running
+            for task in tasks:
+                task.cancel()
+    
     async def search(self, query: SearchQuery) -> SearchResults:
         """
         Execute deep search across all selected sources concurrently
@@ -141,49 +193,26 @@ class SearchOrchestrator:
         # OPTIMIZATION 1: Optimize query
         optimized_query = self.query_optimizer.optimize(query.query, query.context)
         
-        # Prepare tasks based on selected sources
-        tasks = {}
+        # Select engines based on requested sources
+        engines = {}
         sources = [s.lower() for s in query.sources]
         
-        # OPTIMIZATION 2: Use timeouts to prevent slow sources from blocking
-        timeout = 15  # seconds
-        
         if "reddit" in sources:
-            tasks["reddit"] = asyncio.wait_for(
-                self.reddit_engine.search(optimized_query, query.max_results),
-                timeout=timeout
-            )
-        
+            engines["reddit"] = self.reddit_engine
         if "forums" in sources or "web" in sources:
-            tasks["forums"] = asyncio.wait_for(
-                self.web_engine.search(optimized_query, query.max_results),
-                timeout=timeout
-            )
-        
+            engines["forums"] = self.web_engine
         if "youtube" in sources:
-            tasks["youtube"] = asyncio.wait_for(
-                self.youtube_engine.search(optimized_query, query.max_results),
-                timeout=timeout
-            )
-        
-        # OPTIMIZATION 3: Execute all searches concurrently
-        results_dict = {}
-        if tasks:
-            task_names = list(tasks.keys())
-            task_coroutines = list(tasks.values())
-            
-            raw_results = await asyncio.gather(*task_coroutines, return_exceptions=True)
-            
-            for name, result in zip(task_names, raw_results):
-                if isinstance(result, Exception):
-                    if isinstance(result, asyncio.TimeoutError):
-                        print(f"Timeout in {name} search")
-                    else:
-                        print(f"Error in {name} search: {result}")
-                    results_dict[name] = []
-                else:
-                    # Convert to dict for JSON serialization
-                    results_dict[name] = [r.model_dump() for r in result]
+            engines["youtube"] = self.youtube_engine
+        
+        # OPTIMIZATION 2: Execute all searches concurrently, collecting them as they finish
+        completed = {}
+        timed_out = []
+        async for name, source_results, source_timed_out in self.iter_sources(optimized_query, engines, query.max_results):
+            completed[name] = source_results
+            if source_timed_out:
+                timed_out.append(name)
+        # Rank in source order, not completion order, so deduplication stays deterministic
+        results_dict = {name: completed[name] for name in engines}
         
         # OPTIMIZATION 4: Smart ranking and deduplication
         results_dict = self.ranker.rank_and_dedupe(results_dict, query.query)
@@ -196,19 +225,48 @@ class SearchOrchestrator:
             query=query.query,
             results=results_dict,
             total_results=total,
-            search_time_ms=round(elapsed, 2)
+            search_time_ms=round(elapsed, 2),
+            timed_out=timed_out
         )
 
 
+# Recent search results - the same brand/model/object is searched by many users
+SEARCH_CACHE_TTL = 6 * 60 * 60  # seconds
+_search_cache: TTLCache = TTLCache(maxsize=512, ttl=SEARCH_CACHE_TTL)
+
+
+def _normalize(text: Optional[str]) -> str:
+    """Lowercase and collapse whitespace so equivalent queries share a cache key"""
+    return " ".join(text.lower().split()) if text else ""
+
+
+def _cache_key(query: SearchQuery) -> tuple:
+    """Build a hashable cache key from the normalized query fields"""
+    return (
+        _normalize(query.query),
+        _normalize(query.context),
+        tuple(sorted(s.lower() for s in query.sources)),
+        query.max_results
+    )
+
+
 async def deep_search(query_dict: dict) -> dict:
     """
     Main entry point for deep search
-    Accepts a query dict and returns results dict
+    Accepts a query dict and returns results dict (memoized per normalized query)
     """
     query = SearchQuery(**query_dict)
+    key = _cache_key(query)
+    cached = _search_cache.get(key)
+    if cached is not None:
+        return cached
+    
     orchestrator = SearchOrchestrator()
-    results = await orchestrator.search(query)
-    return results.to_dict()
+    results = (await orchestrator.search(query)).to_dict()
+    # Don't pin partial results (a source timed out) or empty ones (usually every source failed)
+    if results["total_results"] and not results["timed_out"]:
+        _search_cache[key] = results
+    return results
 
 
 def create_orchestrator() -> SearchOrchestrator:
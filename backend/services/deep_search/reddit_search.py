@@ -3,21 +3,38 @@ Reddit Search Engine - Searches Reddit for solutions
 Uses Reddit's public JSON API (no authentication required)
 """
 import asyncio
+import logging
 import re
 import math
 from typing import List, Optional
 from urllib.parse import quote_plus
-from bs4 import BeautifulSoup
+from cachetools import TTLCache
 
-from .fetcher import AsyncFetcher
+from ..singleflight import single_flight
+from .config import config
+from .ddg import ddg
+from .fetcher import fetcher
 from .models import RedditResult
 
+logger = logging.getLogger(__name__)
+
 
 class RedditSearch:
     """Reddit search engine using public JSON endpoints"""
     
+    # (query, max_results) -> ranked results
+    _cache: TTLCache = TTLCache(maxsize=256, ttl=config.RESULT_CACHE_TTL)
+    _inflight: dict[tuple, asyncio.Task] = {}  # (query, max_results) -> running search
+    _misses: TTLCache = TTLCache(maxsize=256, ttl=config.EMPTY_RESULT_CACHE_TTL)  # searches that came back empty
+    
+    SUBREDDIT_RE = re.compile(r'/r/(\w+)/')
+    TECH_SUBREDDITS = frozenset({'techsupport', 'fixit', 'diy', 'repair', 'hardware',
+                                 'buildapc', 'laptops', 'headphones', 'audiophile',
+                                 'mobilerepair', 'appliancerepair', 'autorepair'})
+    
     def __init__(self):
-        self.fetcher = AsyncFetcher()
+        self.fetcher = fetcher
+        self.ddg = ddg
         self.base_url = "https://www.reddit.com"
     
     async def search(self, query: str, max_results: int = 10) -> List[RedditResult]:
@@ -25,19 +42,39 @@ class RedditSearch:
         Search Reddit for posts matching the query
         Uses multiple strategies for comprehensive results
         """
-        results = []
+        key = (query, max_results)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+        if key in self._misses:
+            return []
         
+        # Identical concurrent searches share one run
+        results = await single_flight(self._inflight, key, lambda: self._search(query, max_results))
+        return list(results)
+    
+    async def _search(self, query: str, max_results: int) -> List[RedditResult]:
+        """Run the search strategies and cache the ranked results"""
         # Strategy 1: Reddit's native search API (JSON)
-        reddit_results = await self._search_reddit_json(query, max_results)
-        results.extend(reddit_results)
-        
         # Strategy 2: DuckDuckGo search for Reddit (backup)
-        if len(results) < max_results:
-            ddg_results = await self._search_via_duckduckgo(query, max_results - len(results))
+        # Both run concurrently - waiting on the JSON API before starting the
+        # fallback would add its full round trip whenever the fallback is needed
+        reddit_results, ddg_results = await asyncio.gather(
+            self._search_reddit_json(query, max_results),
+            self._search_via_duckduckgo(query, max_results),
+            return_exceptions=True
+        )
+        results = reddit_results if isinstance(reddit_results, list) else []
+        
+        # Top up from the backup strategy only as far as needed
+        if len(results) < max_results and isinstance(ddg_results, list):
             # Avoid duplicates
             existing_urls = {r.url for r in results}
             for r in ddg_results:
+                if len(results) >= max_results:
+                    break
                 if r.url not in existing_urls:
+                    existing_urls.add(r.url)
                     results.append(r)
         
         # Calculate relevance scores
@@ -45,7 +82,12 @@ class RedditSearch:
         
         # Sort by relevance and return top results
         results.sort(key=lambda x: x.relevance, reverse=True)
-        return results[:max_results]
+        results = results[:max_results]
+        if results:
+            self._cache[(query, max_results)] = results
+        else:
+            self._misses[(query, max_results)] = True
+        return results
     
     async def _search_reddit_json(self, query: str, limit: int = 25) -> List[RedditResult]:
         """Search using Reddit's JSON API"""
@@ -61,19 +103,20 @@ class RedditSearch:
                 for post in response["data"].get("children", []):
                     data = post.get("data", {})
                     if data:
+                        selftext = data.get("selftext") or ""
                         result = RedditResult(
                             title=data.get("title", ""),
                             url=f"https://reddit.com{data.get('permalink', '')}",
                             subreddit=data.get('subreddit', ''),
                             score=data.get("score", 0),
                             num_comments=data.get("num_comments", 0),
-                            content=data.get("selftext", "")[:300] if data.get("selftext") else "",
+                            content=selftext[:300],
                             author=data.get("author", ""),
                             created_utc=int(data.get("created_utc", 0))
                         )
                         results.append(result)
         except Exception as e:
-            print(f"Reddit JSON search error: {e}")
+            logger.warning("Reddit JSON search error: %s", e)
         
         return results
     
@@ -81,54 +124,43 @@ class RedditSearch:
         """Fallback: Search Reddit via DuckDuckGo"""
         results = []
         search_query = f"site:reddit.com {query}"
-        encoded = quote_plus(search_query)
-        
-        url = f"https://html.duckduckgo.com/html/?q={encoded}"
         
         try:
-            html = await self.fetcher.fetch(url)
-            if html:
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                for result in soup.select('.result')[:limit]:
-                    title_elem = result.select_one('.result__title a')
-                    snippet_elem = result.select_one('.result__snippet')
+            parsed = await self.ddg.search(search_query)
+            
+            for title, url, snippet in parsed[:limit]:
+                # Only include Reddit URLs
+                if 'reddit.com' in url:
+                    # Parse subreddit from URL
+                    subreddit_match = self.SUBREDDIT_RE.search(url)
                     
-                    if title_elem:
-                        url = title_elem.get('href', '')
-                        # Only include Reddit URLs
-                        if 'reddit.com' in url:
-                            # Parse subreddit from URL
-                            subreddit_match = re.search(r'/r/(\w+)/', url)
-                            subreddit = f"r/{subreddit_match.group(1)}" if subreddit_match else "r/unknown"
-                            
-                            results.append(RedditResult(
-                                title=title_elem.get_text(strip=True),
-                                url=url,
-                                subreddit=subreddit_match.group(1) if subreddit_match else "unknown",
-                                content=snippet_elem.get_text(strip=True) if snippet_elem else "",
-                            ))
+                    results.append(RedditResult(
+                        title=title,
+                        url=url,
+                        subreddit=subreddit_match.group(1) if subreddit_match else "unknown",
+                        content=snippet,
+                    ))
         except Exception as e:
-            print(f"DuckDuckGo Reddit search error: {e}")
+            logger.warning("DuckDuckGo Reddit search error: %s", e)
         
         return results
     
     def _calculate_relevance(self, results: List[RedditResult], query: str) -> List[RedditResult]:
         """Calculate relevance score based on multiple factors"""
-        query_terms = set(query.lower().split())
+        # Overlaps intersect the frozenset with token lists - no per-result sets are built
+        query_terms = frozenset(query.lower().split())
+        # Weight of one matched term, so the loop only counts matches
+        title_weight = 0.4 / len(query_terms) if query_terms else 0.0
+        content_weight = 0.3 / len(query_terms) if query_terms else 0.0
         
         for result in results:
             score = 0.0
             
             # Title relevance (40%)
-            title_terms = set(result.title.lower().split())
-            title_overlap = len(query_terms & title_terms) / len(query_terms) if query_terms else 0
-            score += title_overlap * 0.4
+            score += len(query_terms.intersection(result.title.lower().split())) * title_weight
             
             # Content relevance (30%)
-            content_terms = set(result.content.lower().split())
-            content_overlap = len(query_terms & content_terms) / len(query_terms) if query_terms else 0
-            score += content_overlap * 0.3
+            score += len(query_terms.intersection(result.content.lower().split())) * content_weight
             
             # Engagement score (20%) - log scale for upvotes/comments
             engagement = result.score + (result.num_comments * 2)
@@ -136,11 +168,8 @@ class RedditSearch:
                 score += min(math.log10(engagement + 1) / 5, 0.2)
             
             # Subreddit relevance boost (10%)
-            tech_subreddits = {'techsupport', 'fixit', 'diy', 'repair', 'hardware', 
-                             'buildapc', 'laptops', 'headphones', 'audiophile',
-                             'mobilerepair', 'appliancerepair', 'autorepair'}
             sub_name = result.subreddit.replace('r/', '').lower()
-            if sub_name in tech_subreddits:
+            if sub_name in self.TECH_SUBREDDITS:
                 score += 0.1
             
             result.relevance = min(score, 1.0)
@@ -3,17 +3,61 @@ Web/Forum Search Engine - Searches forums, repair sites, articles
 Optimized for finding REPAIR and FIX solutions
 """
 import asyncio
+import logging
+import re
+from functools import lru_cache
 from typing import List
-from urllib.parse import quote_plus, urlparse
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+from cachetools import TTLCache
 
-from .fetcher import AsyncFetcher
+from ..singleflight import single_flight
+from .config import config
+from .ddg import ddg
 from .models import ForumResult
 
+logger = logging.getLogger(__name__)
+
+# Known domains -> display names, matched with one alternation scan per URL
+_SOURCE_MAP = {
+    "stackoverflow.com": "Stack Overflow",
+    "superuser.com": "Super User",
+    "serverfault.com": "Server Fault",
+    "askubuntu.com": "Ask Ubuntu",
+    "github.com": "GitHub",
+    "howtogeek.com": "How-To Geek",
+    "makeuseof.com": "MakeUseOf",
+    "tomshardware.com": "Tom's Hardware",
+    "quora.com": "Quora",
+    "ifixit.com": "iFixit",
+    "microsoft.com": "Microsoft",
+    "google.com": "Google Support",
+}
+_SOURCE_RE = re.compile("|".join(map(re.escape, _SOURCE_MAP)))
+
+
+@lru_cache(maxsize=4096)
+def _source_name(url: str) -> str:
+    """Source name for a URL: a known site's display name, else its domain"""
+    match = _SOURCE_RE.search(url.lower())
+    if match:
+        return _SOURCE_MAP[match.group(0)]
+    
+    # Extract domain as source
+    try:
+        parsed = urlparse(url)
+        return parsed.netloc.replace("www.", "")
+    except:
+        return "Web"
+
 
 class WebSearch:
     """Web search engine for forums and articles - repair focused"""
     
+    # (query, max_results) -> ranked results
+    _cache: TTLCache = TTLCache(maxsize=256, ttl=config.RESULT_CACHE_TTL)
+    _inflight: dict[tuple, asyncio.Task] = {}  # (query, max_results) -> running search
+    _misses: TTLCache = TTLCache(maxsize=256, ttl=config.EMPTY_RESULT_CACHE_TTL)  # searches that came back empty
+    
     # Repair-focused sites (prioritized)
     REPAIR_SITES = [
         "ifixit.com",
@@ -30,23 +74,39 @@ class WebSearch:
         "answers.microsoft.com",
     ]
     
+    # Priority sources get a boost
+    PRIORITY_SOURCES = frozenset({"Stack Overflow", "Super User", "GitHub", "iFixit"})
+    SECONDARY_SOURCES = frozenset({"How-To Geek", "MakeUseOf", "Tom's Hardware"})
+    
     def __init__(self):
-        self.fetcher = AsyncFetcher()
+        self.ddg = ddg
     
     async def search(self, query: str, max_results: int = 10) -> List[ForumResult]:
         """
         Search forums and tech sites for solutions
         Uses multiple search strategies for better coverage
         """
-        all_results = []
-        
+        key = (query, max_results)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+        if key in self._misses:
+            return []
+        
+        # Identical concurrent searches share one run
+        results = await single_flight(self._inflight, key, lambda: self._search(query, max_results))
+        return list(results)
+    
+    async def _search(self, query: str, max_results: int) -> List[ForumResult]:
+        """Run the search strategies and cache the ranked results"""
         # Strategy 1: Direct search (no site restrictions - most relevant)
-        direct_results = await self._search_direct(query, max_results)
-        all_results.extend(direct_results)
-        
         # Strategy 2: iFixit specific search (for repair queries)
-        ifixit_results = await self._search_site_specific("ifixit.com", query, 5)
-        all_results.extend(ifixit_results)
+        # Independent requests - run both concurrently (each handles its own errors)
+        direct_results, ifixit_results = await asyncio.gather(
+            self._search_direct(query, max_results),
+            self._search_site_specific("ifixit.com", query, 5)
+        )
+        all_results = direct_results + ifixit_results
         
         # Deduplicate by URL
         seen_urls = set()
@@ -61,7 +121,12 @@ class WebSearch:
         
         # Sort and return
         unique_results.sort(key=lambda x: x.relevance, reverse=True)
-        return unique_results[:max_results]
+        unique_results = unique_results[:max_results]
+        if unique_results:
+            self._cache[(query, max_results)] = unique_results
+        else:
+            self._misses[(query, max_results)] = True
+        return unique_results
     
     async def _search_direct(self, query: str, limit: int = 10) -> List[ForumResult]:
         """Direct DuckDuckGo search - no site restrictions for best relevance"""
@@ -73,38 +138,27 @@ class WebSearch:
         if not any(word in query_lower for word in ["fix", "repair", "solve", "solution", "how to"]):
             enhanced_query = f"how to fix {query}"
         
-        encoded = quote_plus(enhanced_query)
-        url = f"https://html.duckduckgo.com/html/?q={encoded}"
-        
         try:
-            html = await self.fetcher.fetch(url)
-            if html:
-                soup = BeautifulSoup(html, 'html.parser')
+            parsed = await self.ddg.search(enhanced_query)
+            
+            for title, link, snippet in parsed[:limit * 2]:  # Get more, filter later
+                # Skip Reddit (we have dedicated Reddit search)
+                if 'reddit.com' in link.lower():
+                    continue
+                
+                source = self._extract_source(link)
                 
-                for result in soup.select('.result')[:limit * 2]:  # Get more, filter later
-                    title_elem = result.select_one('.result__title a')
-                    snippet_elem = result.select_one('.result__snippet')
-                    
-                    if title_elem:
-                        link = title_elem.get('href', '')
-                        
-                        # Skip Reddit (we have dedicated Reddit search)
-                        if 'reddit.com' in link.lower():
-                            continue
-                        
-                        source = self._extract_source(link)
-                        
-                        results.append(ForumResult(
-                            title=title_elem.get_text(strip=True),
-                            url=link,
-                            source=source,
-                            snippet=snippet_elem.get_text(strip=True) if snippet_elem else ""
-                        ))
-                        
-                        if len(results) >= limit:
-                            break
+                results.append(ForumResult(
+                    title=title,
+                    url=link,
+                    source=source,
+                    snippet=snippet
+                ))
+                
+                if len(results) >= limit:
+                    break
         except Exception as e:
-            print(f"DuckDuckGo direct search error: {e}")
+            logger.warning("DuckDuckGo direct search error: %s", e)
         
         return results
     
@@ -113,85 +167,49 @@ class WebSearch:
         results = []
         
         search_query = f"site:{site} {query}"
-        encoded = quote_plus(search_query)
-        url = f"https://html.duckduckgo.com/html/?q={encoded}"
         
         try:
-            html = await self.fetcher.fetch(url)
-            if html:
-                soup = BeautifulSoup(html, 'html.parser')
+            parsed = await self.ddg.search(search_query)
+            
+            for title, link, snippet in parsed[:limit]:
+                source = self._extract_source(link)
                 
-                for result in soup.select('.result')[:limit]:
-                    title_elem = result.select_one('.result__title a')
-                    snippet_elem = result.select_one('.result__snippet')
-                    
-                    if title_elem:
-                        link = title_elem.get('href', '')
-                        source = self._extract_source(link)
-                        
-                        results.append(ForumResult(
-                            title=title_elem.get_text(strip=True),
-                            url=link,
-                            source=source,
-                            snippet=snippet_elem.get_text(strip=True) if snippet_elem else ""
-                        ))
+                results.append(ForumResult(
+                    title=title,
+                    url=link,
+                    source=source,
+                    snippet=snippet
+                ))
         except Exception as e:
-            print(f"Site-specific search error for {site}: {e}")
+            logger.warning("Site-specific search error for %s: %s", site, e)
         
         return results
     
     def _extract_source(self, url: str) -> str:
         """Extract source name from URL"""
-        source_map = {
-            "stackoverflow.com": "Stack Overflow",
-            "superuser.com": "Super User",
-            "serverfault.com": "Server Fault",
-            "askubuntu.com": "Ask Ubuntu",
-            "github.com": "GitHub",
-            "howtogeek.com": "How-To Geek",
-            "makeuseof.com": "MakeUseOf",
-            "tomshardware.com": "Tom's Hardware",
-            "quora.com": "Quora",
-            "ifixit.com": "iFixit",
-            "microsoft.com": "Microsoft",
-            "google.com": "Google Support",
-        }
-        
-        for domain, name in source_map.items():
-            if domain in url.lower():
-                return name
-        
-        # Extract domain as source
-        try:
-            parsed = urlparse(url)
-            return parsed.netloc.replace("www.", "")
-        except:
-            return "Web"
+        return _source_name(url)
     
     def _calculate_relevance(self, results: List[ForumResult], query: str) -> List[ForumResult]:
         """Calculate relevance score"""
-        query_terms = set(query.lower().split())
-        
-        # Priority sources get a boost
-        priority_sources = {"Stack Overflow", "Super User", "GitHub", "iFixit"}
+        # Overlaps intersect the frozenset with token lists - no per-result sets are built
+        query_terms = frozenset(query.lower().split())
+        # Weight of one matched term, so the loop only counts matches
+        title_weight = 0.5 / len(query_terms) if query_terms else 0.0
+        snippet_weight = 0.3 / len(query_terms) if query_terms else 0.0
         
         for result in results:
             score = 0.0
             
             # Title relevance (50%)
-            title_terms = set(result.title.lower().split())
-            title_overlap = len(query_terms & title_terms) / len(query_terms) if query_terms else 0
-            score += title_overlap * 0.5
+            score += len(query_terms.intersection(result.title.lower().split())) * title_weight
             
             # Snippet relevance (30%)
-            snippet_terms = set(result.snippet.lower().split())
-            snippet_overlap = len(query_terms & snippet_terms) / len(query_terms) if query_terms else 0
-            score += snippet_overlap * 0.3
+            score += len(query_terms.intersection(result.snippet.lower().split())) * snippet_weight
             
             # Source quality boost (20%)
-            if result.source in priority_sources:
+            if result.source in self.PRIORITY_SOURCES:
                 score += 0.2
-            elif result.source in ["How-To Geek", "MakeUseOf", "Tom's Hardware"]:
+            elif result.source in self.SECONDARY_SOURCES:
                 score += 0.15
             else:
                 score += 0.05
@@ -3,51 +3,137 @@ YouTube Search Engine - Web Scraping with Transcript Support
 No API keys required!
 """
 import asyncio
+import logging
 import re
-import json
-from typing import List
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from urllib.parse import quote_plus
+from cachetools import TLRUCache, TTLCache
 
-from .fetcher import AsyncFetcher
+from ..singleflight import single_flight
+from .config import config
+from .fetcher import fetcher
 from .models import YouTubeResult
 
+logger = logging.getLogger(__name__)
+
+# Transcript lookups block on the network - kept off the default executor so they can't starve other thread work
+_transcript_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="transcript")
+
 
 class YouTubeSearch:
     """YouTube video search engine using web scraping"""
     
+    # Compiled once - applied to every search results page
+    INITIAL_DATA_RE = re.compile(r'var ytInitialData = ({.*?});', re.DOTALL)
+    INITIAL_DATA_FALLBACK_RE = re.compile(r'ytInitialData\s*=\s*({.*?});', re.DOTALL)
+    
+    # (query, max_results) -> ranked results; video_id -> transcript excerpt
+    _cache: TTLCache = TTLCache(maxsize=256, ttl=config.RESULT_CACHE_TTL)
+    _inflight: dict[tuple, asyncio.Task] = {}  # (query, max_results) -> running search
+    _misses: TTLCache = TTLCache(maxsize=256, ttl=config.EMPTY_RESULT_CACHE_TTL)  # searches that came back empty
+    _transcript_cache: TTLCache = TTLCache(maxsize=1024, ttl=config.TRANSCRIPT_CACHE_TTL)
+    # video_id -> seconds to remember the miss (each entry expires after its own value)
+    _transcript_misses: TLRUCache = TLRUCache(maxsize=1024, ttu=lambda _, ttl, now: now + ttl)
+    _info_cache: TTLCache = TTLCache(maxsize=256, ttl=config.VIDEO_INFO_CACHE_TTL)  # video_id -> oEmbed metadata
+    # Relevance boosts (substring matches on the lowercased title/channel)
+    REPAIR_TERMS = ('fix', 'repair', 'tutorial', 'guide', 'how to', 'diy', 'replace', 'broken')
+    QUALITY_CHANNELS = ('ifixit', 'jerryrigeverything', 'ltt', 'linus', 'hugh jeffreys')
+    # Bounds concurrent transcript lookups (each holds a worker thread) to avoid rate limiting
+    _transcript_slots = asyncio.Semaphore(8)
+    
     def __init__(self):
-        self.fetcher = AsyncFetcher()
+        self.fetcher = fetcher
     
     async def search(self, query: str, max_results: int = 10) -> List[YouTubeResult]:
         """Search YouTube for relevant videos"""
+        key = (query, max_results)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return list(cached)
+        if key in self._misses:
+            return []
+        
+        # Identical concurrent searches share one run
+        results = await single_flight(self._inflight, key, lambda: self._search(query, max_results))
+        return list(results)
+    
+    async def _search(self, query: str, max_results: int) -> List[YouTubeResult]:
+        """Run the search strategies and cache the ranked results"""
         results = await self._search_scrape(query, max_results)
         
-        # Fetch transcripts for top results (limits to 5 for speed)
-        await self._enrich_transcripts(results[:5])
+        # Fetch transcripts for top results (limits to 5 for speed) while the
+        # title/channel part of the score is computed
+        transcript_task = asyncio.create_task(self._enrich_transcripts(results[:5]))
         
         # Calculate relevance
         results = self._calculate_relevance(results, query)
+        await transcript_task
+        self._add_transcript_relevance(results, query)
         
         # Sort by relevance
         results.sort(key=lambda x: x.relevance, reverse=True)
-        return results[:max_results]
+        results = results[:max_results]
+        if results:
+            self._cache[(query, max_results)] = results
+        else:
+            self._misses[(query, max_results)] = True
+        return results
     
     async def _enrich_transcripts(self, results: List[YouTubeResult]):
         """Fetch transcripts for videos"""
-        tasks = [self._get_transcript(r.video_id) for r in results]
+        # Cached transcripts and known misses are applied without scheduling a task
+        pending = []
+        for result in results:
+            cached = self._cached_transcript(result.video_id)
+            if cached is None:
+                pending.append(result)
+            elif cached:
+                result.transcript = cached
+        if not pending:
+            return
+        
+        tasks = [self._get_transcript(r.video_id) for r in pending]
         transcripts = await asyncio.gather(*tasks, return_exceptions=True)
         
-        for result, transcript in zip(results, transcripts):
+        for result, transcript in zip(pending, transcripts):
             if isinstance(transcript, str) and transcript:
-                result.transcript = transcript[:500]
+                result.transcript = transcript
     
     async def _get_transcript(self, video_id: str) -> str:
-        """Extract transcript using youtube-transcript-api"""
+        """Extract transcript using youtube-transcript-api (cached per video, misses cached briefly)"""
+        cached = self._cached_transcript(video_id)
+        if cached is not None:
+            return cached
+        
+        try:
+            async with asyncio.timeout(config.TRANSCRIPT_TIMEOUT):
+                transcript = await self._fetch_transcript(video_id)
+        except TimeoutError:
+            self._transcript_misses[video_id] = config.TRANSCRIPT_TIMEOUT_TTL
+            return ""
+        
+        if transcript:
+            self._transcript_cache[video_id] = transcript
+        else:
+            self._transcript_misses[video_id] = config.TRANSCRIPT_MISS_TTL
+        return transcript
+    
+    def _cached_transcript(self, video_id: str) -> Optional[str]:
+        """Cached excerpt, "" for a remembered miss, or None if the video must be looked up"""
+        cached = self._transcript_cache.get(video_id)
+        if cached is not None:
+            return cached
+        if video_id in self._transcript_misses:
+            return ""
+        return None
+    
+    async def _fetch_transcript(self, video_id: str) -> str:
+        """Fetch a transcript from YouTube"""
         try:
             from youtube_transcript_api import YouTubeTranscriptApi
             
-            loop = asyncio.get_event_loop()
-            
             def fetch_transcript():
                 try:
                     transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
@@ -57,7 +143,7 @@ class YouTubeSearch:
                         try:
                             transcript = transcript_list.find_transcript([lang])
                             entries = transcript.fetch()
-                            return ' '.join(entry['text'] for entry in entries[:50])
+                            return self._excerpt(entries)
                         except:
                             continue
                     
@@ -65,7 +151,7 @@ class YouTubeSearch:
                     try:
                         transcript = transcript_list.find_generated_transcript(['en'])
                         entries = transcript.fetch()
-                        return ' '.join(entry['text'] for entry in entries[:50])
+                        return self._excerpt(entries)
                     except:
                         pass
                     
@@ -73,13 +159,40 @@ class YouTubeSearch:
                 except:
                     return ""
             
-            return await loop.run_in_executor(None, fetch_transcript)
+            async with self._transcript_slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(_transcript_pool, fetch_transcript)
             
         except ImportError:
             return ""
         except Exception:
             return ""
     
+    @staticmethod
+    def _excerpt(entries: list) -> str:
+        """Join transcript entries only as far as the excerpt used for scoring"""
+        parts = []
+        length = 0
+        for entry in entries[:50]:
+            parts.append(entry['text'])
+            length += len(entry['text']) + 1
+            if length > config.TRANSCRIPT_MAX_CHARS:
+                break
+        return ' '.join(parts)[:config.TRANSCRIPT_MAX_CHARS]
+    
+    async def get_video_info(self, video_id: str) -> Optional[dict]:
+        """Fetch basic video metadata (title, channel) from YouTube's oEmbed endpoint (cached per video)"""
+        cached = self._info_cache.get(video_id)
+        if cached is not None:
+            return cached
+        
+        video_url = quote_plus(f"https://www.youtube.com/watch?v={video_id}")
+        url = f"https://www.youtube.com/oembed?url={video_url}&format=json"
+        info = await self.fetcher.fetch(url, json_response=True)
+        if info:
+            self._info_cache[video_id] = info
+        return info
+    
     async def _search_scrape(self, query: str, limit: int = 10) -> List[YouTubeResult]:
         """Search YouTube via web scraping"""
         results = []
@@ -89,18 +202,18 @@ class YouTubeSearch:
         try:
             html = await self.fetcher.fetch(url)
             if html:
-                # Extract ytInitialData JSON
-                match = re.search(r'var ytInitialData = ({.*?});', html, re.DOTALL)
+                # Extract ytInitialData JSON (often 0.5-2 MB - orjson parses it several times faster)
+                match = self.INITIAL_DATA_RE.search(html)
                 if match:
-                    data = json.loads(match.group(1))
+                    data = orjson.loads(match.group(1))
                     results = self._parse_scrape_data(data, limit)
                 else:
-                    match = re.search(r'ytInitialData\s*=\s*({.*?});', html, re.DOTALL)
+                    match = self.INITIAL_DATA_FALLBACK_RE.search(html)
                     if match:
-                        data = json.loads(match.group(1))
+                        data = orjson.loads(match.group(1))
                         results = self._parse_scrape_data(data, limit)
         except Exception as e:
-            print(f"YouTube search error: {e}")
+            logger.warning("YouTube search error: %s", e)
         
         return results
     
@@ -160,47 +273,51 @@ class YouTubeSearch:
                             views=views,
                             thumbnail=thumb,
                         ))
+                        if len(results) >= limit:
+                            return results
         except Exception as e:
-            print(f"YouTube parse error: {e}")
+            logger.warning("YouTube parse error: %s", e)
         
         return results
     
     def _calculate_relevance(self, results: List[YouTubeResult], query: str) -> List[YouTubeResult]:
         """Calculate relevance score"""
-        query_terms = set(query.lower().split())
-        
-        # Repair-focused keywords boost
-        repair_terms = {'fix', 'repair', 'tutorial', 'guide', 'how to', 'diy', 'replace', 'broken'}
+        # Overlaps intersect the frozenset with token lists - no per-result sets are built
+        query_terms = frozenset(query.lower().split())
+        # Weight of one matched term, so the loop only counts matches
+        title_weight = 0.5 / len(query_terms) if query_terms else 0.0
         
         for result in results:
             score = 0.0
             
             # Title relevance (50%)
             title_lower = result.title.lower()
-            title_terms = set(title_lower.split())
-            title_overlap = len(query_terms & title_terms) / len(query_terms) if query_terms else 0
-            score += title_overlap * 0.5
+            score += len(query_terms.intersection(title_lower.split())) * title_weight
             
             # Repair term boost (20%)
-            if any(term in title_lower for term in repair_terms):
+            if any(term in title_lower for term in self.REPAIR_TERMS):
                 score += 0.2
             
-            # Transcript relevance (20%)
-            if result.transcript:
-                transcript_lower = result.transcript.lower()
-                transcript_terms = set(transcript_lower.split())
-                transcript_overlap = len(query_terms & transcript_terms) / len(query_terms) if query_terms else 0
-                score += transcript_overlap * 0.2
-            
             # Channel quality indicators (10%)
             channel_lower = result.channel.lower()
-            quality_channels = ['ifixit', 'jerryrigeverything', 'ltt', 'linus', 'hugh jeffreys']
-            if any(ch in channel_lower for ch in quality_channels):
+            if any(ch in channel_lower for ch in self.QUALITY_CHANNELS):
                 score += 0.1
             
             result.relevance = min(score, 1.0)
         
         return results
+    
+    def _add_transcript_relevance(self, results: List[YouTubeResult], query: str):
+        """Add the transcript part of the score (20%) once transcripts have arrived"""
+        query_terms = frozenset(query.lower().split())
+        if not query_terms:
+            return
+        transcript_weight = 0.2 / len(query_terms)
+        
+        for result in results:
+            if result.transcript:
+                matches = len(query_terms.intersection(result.transcript.lower().split()))
+                result.relevance = min(result.relevance + matches * transcript_weight, 1.0)
 
 
 def create_youtube_search() -> YouTubeSearch:
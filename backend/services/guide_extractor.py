@@ -1,9 +1,78 @@
 """
 Guide Extractor - Extract repair guides from iFixit and web articles
 """
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import time
 import httpx
-from bs4 import BeautifulSoup
+import orjson
+from cachetools import TTLCache
+from functools import lru_cache
+from lxml import etree, html as lxml_html
+from pathlib import Path
 from typing import Optional
+from urllib.parse import urlparse
+
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_CONCURRENCY = 8  # Pages fetched/parsed at once by extract_many
+ARTICLE_MAX_CHARS = 3000  # Article text returned per page
+GUIDE_CACHE_TTL = 7 * 24 * 60 * 60  # iFixit guides rarely change
+# Parsed guides also persist on disk, so a restarted process doesn't refetch them
+GUIDE_CACHE_DIR = Path(os.getenv("GUIDE_CACHE_DIR", "~/.cache/right-to-repair/ifixit")).expanduser()
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one token of the class attribute"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _text(element) -> str:
+    """Concatenated stripped text of an element (matches BeautifulSoup's get_text(strip=True))"""
+    return "".join(part.strip() for part in element.itertext())
+
+
+@lru_cache(maxsize=1024)
+def _domain(url: str) -> str:
+    """Domain of a URL without a leading www. (few distinct hosts - memoized)"""
+    try:
+        domain = urlparse(url).netloc
+        if domain.startswith("www."):
+            domain = domain[4:]
+        return domain
+    except:
+        return ""
+
+
+def _first_text(xpath: etree.XPath, tree) -> str:
+    """Text of the first element matched by xpath, or empty string"""
+    nodes = xpath(tree)
+    return _text(nodes[0]) if nodes else ""
+
+
+# iFixit guide fields - compiled once, evaluated by lxml in C
+_IFIXIT_TITLE = etree.XPath(f"(//h1[{_has_class('title')}])[1]")
+_FIRST_H1 = etree.XPath("(//h1)[1]")
+_IFIXIT_DIFFICULTY = etree.XPath(f"(//div[{_has_class('difficulty')}])[1]")
+_IFIXIT_TIME = etree.XPath(f"(//div[{_has_class('time-required')}])[1]")
+_IFIXIT_TOOLS = etree.XPath(f"(//div[{_has_class('tools')}])[1]//a")
+_IFIXIT_PARTS = etree.XPath(f"(//div[{_has_class('parts')}])[1]//a")
+_IFIXIT_STEPS = etree.XPath(f"//div[{_has_class('step')}]")
+_STEP_PARAGRAPHS = etree.XPath(f"(.//div[{_has_class('step-content')}])[1]//p")
+
+# Generic article fields
+_ARTICLE_NOISE = etree.XPath("//script | //style | //nav | //footer | //header")
+_TITLE = etree.XPath("(//title)[1]")
+_FIRST_ARTICLE = etree.XPath("(//article)[1]")
+_FIRST_MAIN = etree.XPath("(//main)[1]")
+_PARAGRAPHS = etree.XPath(".//p")
+_LISTS = etree.XPath("//ol | //ul")
+_LIST_ITEMS = etree.XPath(".//li")
 
 
 class GuideExtractor:
@@ -11,149 +80,226 @@ class GuideExtractor:
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        # url -> (ETag, Last-Modified, parsed guide) - revalidated with a conditional GET
+        self._guide_cache: TTLCache = TTLCache(maxsize=1024, ttl=GUIDE_CACHE_TTL)
+        self._inflight: dict[str, asyncio.Task] = {}  # url -> running extraction
+    
+    async def get_client(self) -> httpx.AsyncClient:
+        """Get or create reusable HTTP client (keep-alive connections shared across requests)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the HTTP client"""
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+    
+    async def __aenter__(self) -> "GuideExtractor":
+        await self.get_client()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
     
     async def extract_ifixit_guide(self, url: str) -> dict:
-        """Extract structured guide from iFixit URL"""
+        """Extract structured guide from iFixit URL (concurrent requests for a URL share one fetch)"""
+        return await single_flight(self._inflight, url, lambda: self._extract_ifixit_guide(url))
+    
+    async def _extract_ifixit_guide(self, url: str) -> dict:
+        """Fetch (or revalidate) and parse an iFixit guide"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, headers=self.headers, follow_redirects=True)
-                
-                if response.status_code != 200:
-                    return {"error": "Failed to fetch page"}
-                
-                soup = BeautifulSoup(response.text, "lxml")
-                
-                # Extract title
-                title = ""
-                title_elem = soup.find("h1", class_="title")
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                else:
-                    title_elem = soup.find("h1")
-                    if title_elem:
-                        title = title_elem.get_text(strip=True)
-                
-                # Extract difficulty
-                difficulty = ""
-                diff_elem = soup.find("div", class_="difficulty")
-                if diff_elem:
-                    difficulty = diff_elem.get_text(strip=True)
-                
-                # Extract time estimate
-                time_estimate = ""
-                time_elem = soup.find("div", class_="time-required")
-                if time_elem:
-                    time_estimate = time_elem.get_text(strip=True)
-                
-                # Extract tools
-                tools = []
-                tools_section = soup.find("div", class_="tools")
-                if tools_section:
-                    tool_items = tools_section.find_all("a")
-                    tools = [t.get_text(strip=True) for t in tool_items]
-                
-                # Extract parts
-                parts = []
-                parts_section = soup.find("div", class_="parts")
-                if parts_section:
-                    part_items = parts_section.find_all("a")
-                    parts = [p.get_text(strip=True) for p in part_items]
-                
-                # Extract steps
-                steps = []
-                step_sections = soup.find_all("div", class_="step")
-                for i, step in enumerate(step_sections, 1):
-                    step_text = ""
-                    content = step.find("div", class_="step-content")
-                    if content:
-                        paragraphs = content.find_all("p")
-                        step_text = " ".join([p.get_text(strip=True) for p in paragraphs])
-                    
-                    if step_text:
-                        steps.append({
-                            "number": i,
-                            "text": step_text
-                        })
-                
-                return {
-                    "title": title,
-                    "url": url,
-                    "difficulty": difficulty,
-                    "time_estimate": time_estimate,
-                    "tools": tools,
-                    "parts": parts,
-                    "steps": steps,
-                    "source": "iFixit"
-                }
-                
+            client = await self.get_client()
+            
+            # Revalidate a previously parsed guide - a 304 skips the download and the parse
+            cached = self._guide_cache.get(url)
+            if cached is None:
+                # First request for this URL in this process - use the disk copy if it's fresh
+                stored = await asyncio.to_thread(self._read_stored_guide, url)
+                if stored:
+                    etag, last_modified, guide = stored
+                    if etag or last_modified:
+                        self._guide_cache[url] = stored
+                    return guide
+            
+            headers = {}
+            if cached:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+            
+            response = await client.get(url, headers=headers)
+            
+            if response.status_code == 304 and cached:
+                return cached[2]
+            if response.status_code != 200:
+                return {"error": "Failed to fetch page"}
+            
+            guide = await asyncio.to_thread(self._parse_ifixit_guide, response.text, url)
+            
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self._guide_cache[url] = (etag, last_modified, guide)
+            await asyncio.to_thread(self._store_guide, url, etag, last_modified, guide)
+            return guide
+            
         except Exception as e:
-            print(f"iFixit extraction error: {e}")
+            logger.warning("iFixit extraction error: %s", e)
             return {"error": str(e)}
     
+    @staticmethod
+    def _guide_path(url: str) -> Path:
+        """On-disk location of a parsed guide, sharded by URL hash"""
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return GUIDE_CACHE_DIR / key[:2] / f"{key[2:]}.json.gz"
+    
+    def _read_stored_guide(self, url: str) -> Optional[tuple]:
+        """(ETag, Last-Modified, parsed guide) from disk if younger than GUIDE_CACHE_TTL (blocking)"""
+        path = self._guide_path(url)
+        try:
+            if time.time() - path.stat().st_mtime > GUIDE_CACHE_TTL:
+                return None
+            stored = orjson.loads(gzip.decompress(path.read_bytes()))
+            return stored["etag"], stored["last_modified"], stored["guide"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _store_guide(self, url: str, etag: Optional[str], last_modified: Optional[str], guide: dict):
+        """Write a parsed guide to disk (blocking); failures only cost a refetch later"""
+        path = self._guide_path(url)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(gzip.compress(orjson.dumps({
+                "etag": etag,
+                "last_modified": last_modified,
+                "guide": guide
+            })))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("iFixit guide cache write error: %s", e)
+    
     async def extract_article_content(self, url: str) -> dict:
         """Extract main content from any web article"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, headers=self.headers, follow_redirects=True)
-                
-                if response.status_code != 200:
-                    return {"error": "Failed to fetch page"}
-                
-                soup = BeautifulSoup(response.text, "lxml")
-                
-                # Remove script and style elements
-                for script in soup(["script", "style", "nav", "footer", "header"]):
-                    script.decompose()
-                
-                # Get title
-                title = ""
-                title_elem = soup.find("title")
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                
-                # Try to find main content
-                main_content = ""
-                
-                # Look for article or main tags
-                article = soup.find("article") or soup.find("main")
-                if article:
-                    paragraphs = article.find_all("p")
-                    main_content = "\n\n".join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50])
-                else:
-                    # Fallback: get all paragraphs
-                    paragraphs = soup.find_all("p")
-                    main_content = "\n\n".join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50][:10])
-                
-                # Extract any lists (often contain steps)
-                lists = []
-                for ol in soup.find_all(["ol", "ul"]):
-                    items = ol.find_all("li")
-                    if len(items) >= 3:  # Likely a meaningful list
-                        lists.append([li.get_text(strip=True) for li in items])
-                
-                return {
-                    "title": title,
-                    "url": url,
-                    "content": main_content[:3000],  # Limit content size
-                    "lists": lists[:3],  # Top 3 lists
-                    "source": self._extract_domain(url)
-                }
-                
+            client = await self.get_client()
+            response = await client.get(url)
+            
+            if response.status_code != 200:
+                return {"error": "Failed to fetch page"}
+            
+            return await asyncio.to_thread(self._parse_article, response.text, url)
+            
         except Exception as e:
-            print(f"Article extraction error: {e}")
+            logger.warning("Article extraction error: %s", e)
             return {"error": str(e)}
     
+    async def extract_many(self, urls: list[str]) -> list[dict]:
+        """Extract several articles concurrently (bounded), results in input order"""
+        slots = asyncio.Semaphore(EXTRACT_CONCURRENCY)
+        
+        async def extract_one(url: str) -> dict:
+            async with slots:
+                return await self.extract_article_content(url)
+        
+        return await asyncio.gather(*(extract_one(url) for url in urls))
+    
+    def _parse_ifixit_guide(self, html: str, url: str) -> dict:
+        """Walk an iFixit guide page (CPU-bound - runs in a worker thread)"""
+        tree = lxml_html.fromstring(html)
+        
+        # Title (prefer h1.title), difficulty and time estimate
+        title = _first_text(_IFIXIT_TITLE, tree) or _first_text(_FIRST_H1, tree)
+        difficulty = _first_text(_IFIXIT_DIFFICULTY, tree)
+        time_estimate = _first_text(_IFIXIT_TIME, tree)
+        
+        # Tools and parts (links inside the first matching section)
+        tools = [_text(a) for a in _IFIXIT_TOOLS(tree)]
+        parts = [_text(a) for a in _IFIXIT_PARTS(tree)]
+        
+        # Extract steps
+        steps = []
+        for i, step in enumerate(_IFIXIT_STEPS(tree), 1):
+            step_text = " ".join(_text(p) for p in _STEP_PARAGRAPHS(step))
+            
+            if step_text:
+                steps.append({
+                    "number": i,
+                    "text": step_text
+                })
+        
+        return {
+            "title": title,
+            "url": url,
+            "difficulty": difficulty,
+            "time_estimate": time_estimate,
+            "tools": tools,
+            "parts": parts,
+            "steps": steps,
+            "source": "iFixit"
+        }
+    
+    def _parse_article(self, html: str, url: str) -> dict:
+        """Walk a generic article page (CPU-bound - runs in a worker thread)"""
+        tree = lxml_html.fromstring(html)
+        
+        # Remove script and style elements
+        for element in _ARTICLE_NOISE(tree):
+            element.drop_tree()
+        
+        # Get title
+        title = _first_text(_TITLE, tree)
+        
+        # Look for article or main tags, else fall back to all paragraphs
+        containers = _FIRST_ARTICLE(tree) or _FIRST_MAIN(tree)
+        if containers:
+            paragraphs = _PARAGRAPHS(containers[0])
+            max_paragraphs = None
+        else:
+            paragraphs = _PARAGRAPHS(tree)
+            max_paragraphs = 10
+        
+        # Only ARTICLE_MAX_CHARS are kept - stop collecting once they're reached
+        kept = []
+        length = 0
+        for p in paragraphs:
+            text = _text(p)
+            if len(text) > 50:
+                kept.append(text)
+                length += len(text) + 2
+                if length >= ARTICLE_MAX_CHARS or len(kept) == max_paragraphs:
+                    break
+        main_content = "\n\n".join(kept)
+        
+        # Extract any lists (often contain steps)
+        lists = []
+        for list_elem in _LISTS(tree):
+            items = _LIST_ITEMS(list_elem)
+            if len(items) >= 3:  # Likely a meaningful list
+                lists.append([_text(li) for li in items])
+                if len(lists) == 3:  # Top 3 lists
+                    break
+        
+        return {
+            "title": title,
+            "url": url,
+            "content": main_content[:ARTICLE_MAX_CHARS],  # Limit content size
+            "lists": lists,
+            "source": self._extract_domain(url)
+        }
+    
     def _extract_domain(self, url: str) -> str:
         """Extract domain name from URL"""
-        try:
-            from urllib.parse import urlparse
-            parsed = urlparse(url)
-            domain = parsed.netloc
-            if domain.startswith("www."):
-                domain = domain[4:]
-            return domain
-        except:
-            return ""
+        return _domain(url)
 
 
 # Singleton instance
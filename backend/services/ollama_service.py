@@ -3,13 +3,306 @@ Ollama Service - Integration with Qwen3-VL model using direct HTTP
 Optimized for RTX 4050 6GB VRAM with live video streaming support
 """
 import asyncio
-import base64
+import hashlib
 import io
-import json
+import logging
+import os
+import orjson
+import pybase64
 import re
-from typing import Optional, AsyncGenerator
-from PIL import Image
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Optional, AsyncGenerator, AsyncIterator
+from PIL import Image, ImageStat, features
 import httpx
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_THINK_BLOCK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+# String fields salvageable from a truncated detection reply, found in one scan
+_PARTIAL_FIELD_RE = re.compile(r'"(object|brand|model|serial_number|condition)"\s*:\s*"([^"]*)"')
+# Characters that matter when scanning for a JSON object's closing brace
+_JSON_SCAN_RE = re.compile(r'[{}"\\]')
+# Request bodies are serialized with orjson (httpx's json= uses the stdlib encoder)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Dedicated pool for JPEG decode/resize so frames don't queue behind other executor work
+_image_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="image")
+
+# Live frames: 672px keeps detail for the model; BILINEAR is several times cheaper than
+# LANCZOS per frame (full-quality detections keep LANCZOS)
+LIVE_FRAME_SIZE = 672
+LIVE_RESAMPLE = Image.Resampling.BILINEAR
+
+# Live results are reused for frames whose 64-bit dHash is within this many bits of a recent
+# frame's - a static scene then skips inference entirely
+LIVE_RESULT_CACHE_SIZE = 32
+LIVE_HASH_DISTANCE = 4
+# The cache is shared by every client, so a hit must come from the last few seconds
+# (an old result for a dark/blank frame, or another user's scene, is never reused)
+LIVE_RESULT_TTL = 3.0
+
+
+async def _ndjson_lines(response: httpx.Response) -> AsyncIterator[bytes]:
+    """Split a streamed NDJSON body into raw lines (orjson parses bytes - no per-line decode)"""
+    buf = bytearray()
+    async for chunk in response.aiter_bytes():
+        buf += chunk
+        start = 0
+        while (newline := buf.find(b"\n", start)) != -1:
+            yield bytes(buf[start:newline])
+            start = newline + 1
+        del buf[:start]
+    if buf:
+        yield bytes(buf)
+
+
+def _extract_first_json_object(text: str) -> Optional[str]:
+    """
+    First balanced {...} object in text, or None if there is none or it never closes
+    Braces inside strings are ignored; the regex jumps between structural characters
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped_at = -1  # Position of the character a backslash escapes
+    for match in _JSON_SCAN_RE.finditer(text, start):
+        i = match.start()
+        if i == escaped_at:
+            continue
+        ch = match.group()
+        if in_string:
+            if ch == '\\':
+                escaped_at = i + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+class IncrementalJsonParser:
+    """
+    Incremental parser for a JSON object streamed token by token
+    Each delta is scanned once; feed() returns the top-level fields it completed
+    """
+    
+    def __init__(self):
+        self._text = ""
+        self._pos = 0  # Next character to scan
+        self._start = -1  # Index of the object's opening brace
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.fields: dict = {}
+        self.done = False
+    
+    def feed(self, delta: str) -> dict:
+        """Add a streamed delta, returning any newly completed top-level fields"""
+        if self.done:
+            return {}
+        self._text += delta
+        text = self._text
+        completed = {}
+        
+        pos = self._pos
+        while pos < len(text):
+            ch = text[pos]
+            pos += 1
+            if self._start == -1:
+                # Skip any preamble before the object
+                if ch == '{':
+                    self._start = pos - 1
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{' or ch == '[':
+                self._depth += 1
+            elif ch == '}' or ch == ']':
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.update(self._complete(text[self._start:pos]))
+                    self.done = True
+                    break
+            elif ch == ',' and self._depth == 1:
+                # A top-level value just ended - close the object so far and parse it
+                completed.update(self._complete(text[self._start:pos - 1] + '}'))
+        
+        self._pos = pos
+        return completed
+    
+    def _complete(self, candidate: str) -> dict:
+        """Parse a closed prefix of the object and return the fields not seen before"""
+        try:
+            parsed = orjson.loads(candidate)
+        except orjson.JSONDecodeError:
+            return {}
+        new_fields = {k: v for k, v in parsed.items() if k not in self.fields}
+        self.fields.update(new_fields)
+        return new_fields
+
+
+# Prompts are module constants so every call sends byte-identical text - with the model kept
+# loaded (KEEP_ALIVE), Ollama reuses the cached prompt prefix instead of re-evaluating it
+KEEP_ALIVE = "30m"
+
+# Universal natural prompt - let the model judge
+_PROMPT_DETECT_LIVE = """What is this object and what condition is it in?
+
+JSON: {"object":"name","brand":"","model":"","condition":"broken|damaged|worn|good","issues":[],"description":""}
+/no_think"""
+
+_PROMPT_DETECT = """Analyze the PRIMARY OBJECT in this image. IGNORE the background surface (table, floor, fabric).
+
+## STEP 1: OBJECT ISOLATION
+- What is the MAIN OBJECT in focus? (not the surface it sits on)
+- What is the background surface? (wood table, fabric, tile floor - EXCLUDE from damage analysis)
+- Primary material of OBJECT: metal, plastic, glass, rubber, fabric, PCB, leather?
+
+**Material Verification (to avoid confusion):**
+- Metal: Shows REFLECTIONS, uniform shine, cold appearance
+- Wood: Natural GRAIN LINES, warm tone, organic texture variation
+- If scratched surface shows metal grain → it's METAL (not wood floor)
+
+## STEP 2: SHAPE & STRUCTURE (3D geometry)
+Examine the PHYSICAL FORM of the object:
+
+**A) Overall Shape Integrity:**
+- Is the silhouette/outline intact and symmetrical?
+- Any parts PHYSICALLY SEPARATED or detached from main body?
+
+**B) 3D Deformation Test (CRITICAL for bent vs cracked):**
+- Does the device sit FLAT on a surface, or does it rock/have gaps?
+- Are there CURVES in edges that should be straight? (view from side/profile)
+- Is there SEPARATION between screen and frame/bezel? (visible gaps)
+- Is the back panel or case BULGING outward? (swollen battery indicator)
+
+**KEY DISTINCTION:**
+- BENT/WARPED = 3D shape is wrong (doesn't sit flat, curved edges, gaps)
+- CRACKED = Surface damage but shape is still correct
+
+## STEP 3: SURFACE ANALYSIS (2D texture)
+Look at the FACE/SURFACE of the object (not edges):
+
+**Surface Damage Types:**
+- CRACKS = Dark fracture lines that break through surface material (glass, plastic)
+- SCRATCHES = Shallow marks on surface (don't penetrate material)
+- DENTS = Localized depressions/indentations in surface
+
+**Screen-Specific (to avoid confusion):**
+- Dead pixels: Tiny dots in grid pattern, screen is FLAT
+- Screen protector bubbles: RAISED circular areas, can see film EDGE around screen border
+- Screen cracks: Spiderweb pattern, glass fracture lines
+
+**Ignore:** Wood grain, fabric weave, brushed metal patterns - these are NOT damage
+
+## STEP 4: COLOR + TEXTURE DEFECT IDENTIFICATION
+Match BOTH color AND texture (color alone is insufficient):
+
+| Defect Appearance | Color | Texture | What it indicates |
+|-------------------|-------|---------|-------------------|
+| **Burns** | BLACK/dark brown | SHARP edges, localized, soot | Heat damage to component/PCB |
+| **Rust** | ORANGE/red-brown | Flaky, rough | Iron oxidation |
+| **Copper Corrosion** | GREEN/teal/blue | CRUSTY, fuzzy, crystalline | PCB/metal corrosion from moisture |
+| **Battery Leak** | WHITE powder | Crusty deposits | Battery acid corrosion |
+| **Swollen Battery** | Same color as device | BULGING, raised, gaps | Internal pressure/expansion |
+
+**CRITICAL:** Burnt vs Corroded PCB:
+- Burnt = BLACK with SHARP edges, localized burn pattern, may have melted plastic
+- Corroded = GREEN/white FUZZY deposits, crusty texture, spreads irregularly
+
+## STEP 5: SERIAL/MODEL NUMBER CHECK
+- Look for any visible labels, stickers, or engravings
+- Extract serial number (S/N, SN, Serial) if visible
+- Extract model number if visible
+- Brand name/logo if visible
+
+## STEP 6: FINAL VERDICT
+Based ONLY on confirmed observations:
+
+**Condition Definitions:**
+- "broken" = Parts DETACHED, separated, snapped off, or physically disconnected
+- "damaged" = Cracks, bends, burns, rust, corrosion, swelling present (but parts attached)
+- "worn" = Only minor cosmetic wear (light scratches, scuffs, fading)
+- "good" = No structural or functional defects found
+
+**CRITICAL CONSISTENCY RULES:**
+1. If description mentions detached/separated parts → condition MUST be "broken"
+2. If description mentions cracks/burns/corrosion/bends/swelling → condition MUST be "damaged"
+3. Issues array MUST include location and evidence for EACH defect mentioned in description
+4. If you identify bending, explain evidence (gaps, won't sit flat, curved edges)
+5. If electrical damage, specify if burnt (black/sharp) or corroded (green/fuzzy)
+6. Do NOT confuse background surface texture with object damage
+7. Brand/model/serial: Use "" if not visible
+
+**Issues format:** "[damage type] at [location] - [evidence]"
+Examples:
+- "bent chassis - device has 2mm gap when laid flat, left edge curves outward"
+- "swollen battery - back panel bulges, screen separated from bezel with visible gap"
+- "burn damage at component U3 - black charring with sharp edges"
+- "corrosion at battery terminals - green crusty deposits, fuzzy texture"
+
+Provide JSON only:
+{
+    "object": "specific item name",
+    "brand": "",
+    "model": "",
+    "serial_number": "",
+    "condition": "broken|damaged|worn|good",
+    "issues": ["damage at location - evidence"],
+    "description": "what you observe about the object"
+}
+
+/no_think"""
+
+_PROMPT_EXTRACT_SERIAL = """Extract product identifiers from this label image.
+
+OUTPUT JSON ONLY:
+{
+    "serial_number": "SN value or 'Not Found'",
+    "model_number": "Model or 'Not Found'",
+    "manufacturer": "Company or 'Unknown'",
+    "other_codes": ["FCC ID", "other codes"]
+}
+
+/no_think"""
+
+
+# Static tail of every chat prompt
+_CHAT_GUIDELINES = """You are a knowledgeable repair advisor. Answer the user's question directly and helpfully.
+
+GUIDELINES:
+1. If asked "repair vs buy new" - Consider: age of item, cost of repair vs replacement, availability of parts, environmental impact. Give a balanced recommendation.
+2. If asked about cost - Give rough estimates if possible, mention it varies by location/service.
+3. If asked about difficulty - Rate as Easy/Medium/Hard and explain why.
+4. If asked general questions - Answer based on the detected item's condition and issues.
+5. Be concise but informative (under 150 words).
+6. Be encouraging about repair when practical - this is a Right to Repair assistant!
+7. If unsure, say so honestly and suggest what info would help.
+8. Remember the conversation context - don't repeat information already discussed.
+
+Respond naturally and helpfully:
+
+/no_think"""
+
 
 class OllamaService:
     def __init__(self, host: str = "http://localhost:11434"):
@@ -17,8 +310,8 @@ class OllamaService:
         self.model = "qwen3-vl:4b"
         # Reuse HTTP client with connection pooling for speed
         self._client = None
-        # Lock to prevent concurrent inference (DROP policy for live video)
-        self._is_processing = False
+        # GPU slot for live inference (DROP policy for live video) - raise to run more in parallel
+        self._gpu_semaphore = asyncio.Semaphore(1)
         
         # Options for LIVE video ONLY (balanced for speed + accuracy)
         self._live_inference_options = {
@@ -29,31 +322,46 @@ class OllamaService:
             "num_gpu": 99,
         }
         # Regular detection uses Ollama defaults (no restrictions)
+        
+        # Recent live frames (8-byte digest -> resized base64), so a retried frame isn't re-encoded
+        self._b64_cache: LRUCache = LRUCache(maxsize=4)
+        # Recent live detections by frame dHash -> (stored at, result), oldest first
+        # (scanned by Hamming distance, so not a plain TTLCache)
+        self._live_results: OrderedDict[int, tuple[float, dict]] = OrderedDict()
     
     async def warmup(self):
         """Warm up the model by loading it into VRAM"""
         try:
-            print("🔥 Warming up Ollama model...")
+            if not features.check_feature("libjpeg_turbo"):
+                logger.warning("Pillow is not linked against libjpeg-turbo - JPEG decode/encode will be slower")
+            logger.info("Warming up Ollama model")
             client = await self.get_client()
-            # Simple request to load model into memory
+            # Tiny request with a 32x32 gray image, so the vision encoder is loaded too
+            # (a text-only prompt leaves the image path cold for the first frame)
+            blank = io.BytesIO()
+            Image.new('RGB', (32, 32), (128, 128, 128)).save(blank, format='JPEG')
             payload = {
                 "model": self.model,
+                "keep_alive": KEEP_ALIVE,
                 "prompt": "Hello",
+                "images": [pybase64.b64encode_as_string(blank.getvalue())],
                 "stream": False,
                 "options": {"num_predict": 1}
             }
-            await client.post(f"{self.host}/api/generate", json=payload)
-            print("✅ Model warmed up and ready")
+            await client.post(f"{self.host}/api/generate", content=orjson.dumps(payload), headers=_JSON_HEADERS)
+            logger.info("Model warmed up and ready")
         except Exception as e:
-            print(f"⚠️ Warmup failed (model will load on first request): {e}")
+            logger.warning("Warmup failed (model will load on first request): %s", e)
     
     async def get_client(self) -> httpx.AsyncClient:
         """Get or create reusable HTTP client"""
         if self._client is None or self._client.is_closed:
             # Disable proxy for localhost to avoid connection issues
+            # Ollama serves plain HTTP/1.1 (no h2c), so concurrent calls each get a pooled
+            # connection - kept alive across the gaps between live frames
             self._client = httpx.AsyncClient(
                 timeout=httpx.Timeout(120.0, connect=10.0),
-                limits=httpx.Limits(max_keepalive_connections=5),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=5, keepalive_expiry=60.0),
                 proxy=None,  # Bypass any system proxy
                 trust_env=False  # Don't use HTTP_PROXY env vars
             )
@@ -62,15 +370,24 @@ class OllamaService:
     async def process_image(self, image_bytes: bytes, max_size: int = 1024) -> bytes:
         """Resize image to optimize performance while maintaining quality"""
         try:
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, self._resize_image_sync, image_bytes, max_size)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_image_pool, self._resize_image_sync, image_bytes, max_size)
         except Exception as e:
-            print(f"Image processing error: {e}")
+            logger.warning("Image processing error: %s", e)
             return image_bytes
             
-    def _resize_image_sync(self, image_bytes: bytes, max_size: int) -> bytes:
+    def _resize_image_sync(
+        self,
+        image_bytes: bytes,
+        max_size: int,
+        resample: Image.Resampling = Image.Resampling.LANCZOS
+    ) -> bytes:
         """Synchronous image resizing helper - optimized for quality"""
         with Image.open(io.BytesIO(image_bytes)) as img:
+            # Let libjpeg decode at a reduced scale (1/2, 1/4, 1/8) when the frame is
+            # much larger than the target - still >= max_size, so the resize below keeps quality
+            img.draft('RGB', (max_size, max_size))
+            
             # Convert to RGB if needed
             if img.mode != 'RGB':
                 img = img.convert('RGB')
@@ -79,8 +396,8 @@ class OllamaService:
             ratio = min(max_size / img.width, max_size / img.height)
             if ratio < 1.0:
                 new_size = (int(img.width * ratio), int(img.height * ratio))
-                # Use LANCZOS for better quality (important for damage detection)
-                img = img.resize(new_size, Image.Resampling.LANCZOS)
+                # LANCZOS by default for better quality (important for damage detection)
+                img = img.resize(new_size, resample)
             
             # Save to bytes with higher quality for better detection
             output = io.BytesIO()
@@ -90,251 +407,216 @@ class OllamaService:
     async def process_image_fast(self, image_bytes: bytes) -> bytes:
         """Fast image processing for live video - larger size (672px) for better accuracy"""
         try:
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, self._resize_image_sync, image_bytes, 672)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                _image_pool, self._resize_image_sync, image_bytes, LIVE_FRAME_SIZE, LIVE_RESAMPLE
+            )
         except Exception as e:
-            print(f"Fast image processing error: {e}")
+            logger.warning("Fast image processing error: %s", e)
             return image_bytes
     
+    async def _b64_encode(self, image_bytes: bytes) -> str:
+        """Base64-encode an image in the image pool (large JPEGs would stall the event loop)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_image_pool, pybase64.b64encode_as_string, image_bytes)
+    
+    async def process_image_fast_b64(self, image_bytes: bytes) -> str:
+        """process_image_fast + base64 in one pool call - returns the string Ollama expects"""
+        key = hashlib.blake2b(image_bytes, digest_size=8).digest()
+        cached = self._b64_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            loop = asyncio.get_running_loop()
+            image_b64 = await loop.run_in_executor(_image_pool, self._resize_and_b64_sync, image_bytes)
+            self._b64_cache[key] = image_b64
+            return image_b64
+        except Exception as e:
+            logger.warning("Fast image processing error: %s", e)
+            return await self._b64_encode(image_bytes)
+    
+    def _resize_and_b64_sync(self, image_bytes: bytes) -> str:
+        """Resize (live settings), JPEG-encode and base64-encode in one worker hop"""
+        return pybase64.b64encode_as_string(self._resize_image_sync(image_bytes, LIVE_FRAME_SIZE, LIVE_RESAMPLE))
+    
     def check_image_quality(self, image_bytes: bytes) -> dict:
         """Quick quality check for live frames"""
         try:
             with Image.open(io.BytesIO(image_bytes)) as img:
+                size = img.size
+                # Brightness doesn't need full resolution - let libjpeg decode at up to 1/8 scale
+                img.draft('RGB', (128, 128))
+                
                 # Check if image is too dark or too bright
                 if img.mode != 'RGB':
                     img = img.convert('RGB')
                 
-                # Sample pixels for quick brightness check
-                pixels = list(img.getdata())
-                if len(pixels) > 1000:
-                    pixels = pixels[::len(pixels)//1000]  # Sample ~1000 pixels
-                
-                avg_brightness = sum(sum(p) for p in pixels) / (len(pixels) * 3)
+                # Per-channel means computed in C - no pixel copies
+                avg_brightness = sum(ImageStat.Stat(img).mean) / 3
                 
                 return {
                     "valid": 30 < avg_brightness < 240,
                     "brightness": avg_brightness,
-                    "size": img.size
+                    "size": size
                 }
         except Exception as e:
             return {"valid": False, "error": str(e)}
     
+    @property
+    def is_busy(self) -> bool:
+        """True while every live-inference GPU slot is taken"""
+        return self._gpu_semaphore.locked()
+    
     async def detect_object_live(self, image_bytes: bytes) -> dict:
         """Fast detection for live video - structured reasoning prompt"""
+        # Near-identical frames reuse a recent result - answered even while inference is running,
+        # and without taking a GPU slot
+        loop = asyncio.get_running_loop()
+        try:
+            fingerprint = await loop.run_in_executor(_image_pool, self._dhash_sync, image_bytes)
+        except Exception as e:
+            logger.warning("Frame hash error: %s", e)
+            fingerprint = None
+        
+        cached = self._similar_live_result(fingerprint) if fingerprint is not None else None
+        if cached is not None:
+            logger.debug("Reusing detection for a near-identical frame")
+            return dict(cached)
+        
         # DROP policy: skip if already processing
-        if self._is_processing:
+        # (acquire doesn't yield when a slot is free, so check + acquire is atomic)
+        if self.is_busy:
             return {"skipped": True, "reason": "busy"}
         
-        self._is_processing = True
+        await self._gpu_semaphore.acquire()
         try:
-            optimized_image = await self.process_image_fast(image_bytes)
+            image_b64 = await self.process_image_fast_b64(image_bytes)
             
-            # Universal natural prompt - let the model judge
-            prompt = """What is this object and what condition is it in?
-
-JSON: {"object":"name","brand":"","model":"","condition":"broken|damaged|worn|good","issues":[],"description":""}
-/no_think"""
-            
-            response = await self._generate_live(prompt, [optimized_image])
-            result = self._parse_json_response(response, "object")
+            response = await self._generate_live(_PROMPT_DETECT_LIVE, [image_b64])
+            # Live mode requests format="json", so the reply normally parses in one pass
+            try:
+                result = orjson.loads(response)
+            except orjson.JSONDecodeError:
+                result = None
+            if isinstance(result, dict):
+                # Only clean replies are reused for similar frames
+                if fingerprint is not None and "error" not in result:
+                    self._remember_live_result(fingerprint, {**result, "skipped": False})
+            else:
+                result = self._parse_json_response(response, "object")
             result["skipped"] = False
             return result
         finally:
-            self._is_processing = False
+            self._gpu_semaphore.release()
     
-    async def stream_detect_live(self, image_bytes: bytes) -> AsyncGenerator[str, None]:
-        """Stream detection results for live video with token-by-token output"""
-        print(f"🎬 stream_detect_live called, _is_processing={self._is_processing}")
+    @staticmethod
+    def _dhash_sync(image_bytes: bytes) -> int:
+        """64-bit difference hash of a frame (decoded at reduced scale - a few pixels are enough)"""
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.draft('L', (64, 64))
+            pixels = img.convert('L').resize((9, 8), Image.Resampling.BILINEAR).tobytes()
         
-        if self._is_processing:
-            print("⏭️ Skipping - already processing")
-            yield '{"skipped": true, "reason": "busy"}'
+        bits = 0
+        for row in range(0, 72, 9):
+            for i in range(row, row + 8):
+                bits = (bits << 1) | (pixels[i] > pixels[i + 1])
+        return bits
+    
+    def _similar_live_result(self, fingerprint: int) -> Optional[dict]:
+        """Most recent result younger than LIVE_RESULT_TTL whose frame hash is within LIVE_HASH_DISTANCE bits"""
+        # Entries are kept in insertion order, so expired ones are always at the front
+        cutoff = time.monotonic() - LIVE_RESULT_TTL
+        while self._live_results:
+            oldest = next(iter(self._live_results))
+            if self._live_results[oldest][0] >= cutoff:
+                break
+            del self._live_results[oldest]
+        
+        for known in reversed(self._live_results):
+            if (known ^ fingerprint).bit_count() <= LIVE_HASH_DISTANCE:
+                return self._live_results[known][1]
+        return None
+    
+    def _remember_live_result(self, fingerprint: int, result: dict):
+        self._live_results[fingerprint] = (time.monotonic(), result)
+        self._live_results.move_to_end(fingerprint)
+        if len(self._live_results) > LIVE_RESULT_CACHE_SIZE:
+            self._live_results.popitem(last=False)
+    
+    async def stream_detect_live(self, image_bytes: bytes) -> AsyncGenerator[dict, None]:
+        """Stream detection results for live video - yields each field as soon as the model completes it"""
+        logger.debug("stream_detect_live called, busy=%s", self.is_busy)
+        
+        if self.is_busy:
+            logger.debug("Skipping - already processing")
+            yield {"skipped": True, "reason": "busy"}
             return
         
-        self._is_processing = True
+        await self._gpu_semaphore.acquire()
         try:
-            optimized_image = await self.process_image_fast(image_bytes)
-            image_b64 = base64.b64encode(optimized_image).decode('utf-8')
-            print(f"🖼️ Live image prepared: {len(image_b64)} chars")
-            
-            # Universal natural prompt - let the model judge
-            prompt = """What is this object and what condition is it in?
-
-JSON: {"object":"name","brand":"","model":"","condition":"broken|damaged|worn|good","issues":[],"description":""}
-/no_think"""
+            image_b64 = await self.process_image_fast_b64(image_bytes)
+            logger.debug("Live image prepared: %d chars", len(image_b64))
             
             payload = {
                 "model": self.model,
-                "prompt": prompt,
+                "keep_alive": KEEP_ALIVE,
+                "prompt": _PROMPT_DETECT_LIVE,
                 "images": [image_b64],
                 "stream": True,
                 "options": self._live_inference_options
             }
             
-            print(f"🔧 Live options: {self._live_inference_options}")
-            
             client = await self.get_client()
-            print(f"📤 Sending streaming request to Ollama...")
+            logger.debug("Sending streaming request to Ollama")
             
-            async with client.stream("POST", f"{self.host}/api/generate", json=payload) as response:
-                print(f"📥 Stream response status: {response.status_code}")
+            parser = IncrementalJsonParser()
+            async with client.stream(
+                "POST", f"{self.host}/api/generate", content=orjson.dumps(payload), headers=_JSON_HEADERS
+            ) as response:
+                logger.debug("Stream response status: %s", response.status_code)
                 line_count = 0
-                async for line in response.aiter_lines():
+                async for line in _ndjson_lines(response):
                     line_count += 1
                     if line:
                         try:
-                            data = json.loads(line)
+                            data = orjson.loads(line)
                             token = data.get("response", "")
                             done = data.get("done", False)
                             done_reason = data.get("done_reason", "")
                             
                             if done:
-                                print(f"✅ Stream done: reason={done_reason}, lines={line_count}")
+                                logger.debug("Stream done: reason=%s, lines=%d", done_reason, line_count)
                             
                             if token:
-                                yield token
-                        except json.JSONDecodeError as e:
-                            print(f"⚠️ JSON decode error: {e}, line: {line[:100]}")
+                                fields = parser.feed(token)
+                                if fields:
+                                    yield fields
+                        except orjson.JSONDecodeError as e:
+                            logger.warning("JSON decode error: %s, line: %r", e, line[:100])
                             continue
                 
-                print(f"📊 Total lines received: {line_count}")
+                logger.debug("Total lines received: %d", line_count)
                 
         except Exception as e:
-            print(f"❌ stream_detect_live error: {e}")
-            import traceback
-            traceback.print_exc()
-            yield f'{{"error": "{str(e)}"}}'
+            logger.exception("stream_detect_live error: %s", e)
+            yield {"error": str(e)}
         finally:
-            self._is_processing = False
-            print(f"🎬 stream_detect_live finished, _is_processing reset to False")
+            self._gpu_semaphore.release()
+            logger.debug("stream_detect_live finished, GPU slot released")
     
     async def detect_object(self, image_bytes: bytes) -> dict:
         """Detect object, brand, model, and condition from image"""
         optimized_image = await self.process_image(image_bytes)
         
-        prompt = """Analyze the PRIMARY OBJECT in this image. IGNORE the background surface (table, floor, fabric).
-
-## STEP 1: OBJECT ISOLATION
-- What is the MAIN OBJECT in focus? (not the surface it sits on)
-- What is the background surface? (wood table, fabric, tile floor - EXCLUDE from damage analysis)
-- Primary material of OBJECT: metal, plastic, glass, rubber, fabric, PCB, leather?
-
-**Material Verification (to avoid confusion):**
-- Metal: Shows REFLECTIONS, uniform shine, cold appearance
-- Wood: Natural GRAIN LINES, warm tone, organic texture variation
-- If scratched surface shows metal grain → it's METAL (not wood floor)
-
-## STEP 2: SHAPE & STRUCTURE (3D geometry)
-Examine the PHYSICAL FORM of the object:
-
-**A) Overall Shape Integrity:**
-- Is the silhouette/outline intact and symmetrical?
-- Any parts PHYSICALLY SEPARATED or detached from main body?
-
-**B) 3D Deformation Test (CRITICAL for bent vs cracked):**
-- Does the device sit FLAT on a surface, or does it rock/have gaps?
-- Are there CURVES in edges that should be straight? (view from side/profile)
-- Is there SEPARATION between screen and frame/bezel? (visible gaps)
-- Is the back panel or case BULGING outward? (swollen battery indicator)
-
-**KEY DISTINCTION:**
-- BENT/WARPED = 3D shape is wrong (doesn't sit flat, curved edges, gaps)
-- CRACKED = Surface damage but shape is still correct
-
-## STEP 3: SURFACE ANALYSIS (2D texture)
-Look at the FACE/SURFACE of the object (not edges):
-
-**Surface Damage Types:**
-- CRACKS = Dark fracture lines that break through surface material (glass, plastic)
-- SCRATCHES = Shallow marks on surface (don't penetrate material)
-- DENTS = Localized depressions/indentations in surface
-
-**Screen-Specific (to avoid confusion):**
-- Dead pixels: Tiny dots in grid pattern, screen is FLAT
-- Screen protector bubbles: RAISED circular areas, can see film EDGE around screen border
-- Screen cracks: Spiderweb pattern, glass fracture lines
-
-**Ignore:** Wood grain, fabric weave, brushed metal patterns - these are NOT damage
-
-## STEP 4: COLOR + TEXTURE DEFECT IDENTIFICATION
-Match BOTH color AND texture (color alone is insufficient):
-
-| Defect Appearance | Color | Texture | What it indicates |
-|-------------------|-------|---------|-------------------|
-| **Burns** | BLACK/dark brown | SHARP edges, localized, soot | Heat damage to component/PCB |
-| **Rust** | ORANGE/red-brown | Flaky, rough | Iron oxidation |
-| **Copper Corrosion** | GREEN/teal/blue | CRUSTY, fuzzy, crystalline | PCB/metal corrosion from moisture |
-| **Battery Leak** | WHITE powder | Crusty deposits | Battery acid corrosion |
-| **Swollen Battery** | Same color as device | BULGING, raised, gaps | Internal pressure/expansion |
-
-**CRITICAL:** Burnt vs Corroded PCB:
-- Burnt = BLACK with SHARP edges, localized burn pattern, may have melted plastic
-- Corroded = GREEN/white FUZZY deposits, crusty texture, spreads irregularly
-
-## STEP 5: SERIAL/MODEL NUMBER CHECK
-- Look for any visible labels, stickers, or engravings
-- Extract serial number (S/N, SN, Serial) if visible
-- Extract model number if visible
-- Brand name/logo if visible
-
-## STEP 6: FINAL VERDICT
-Based ONLY on confirmed observations:
-
-**Condition Definitions:**
-- "broken" = Parts DETACHED, separated, snapped off, or physically disconnected
-- "damaged" = Cracks, bends, burns, rust, corrosion, swelling present (but parts attached)
-- "worn" = Only minor cosmetic wear (light scratches, scuffs, fading)
-- "good" = No structural or functional defects found
-
-**CRITICAL CONSISTENCY RULES:**
-1. If description mentions detached/separated parts → condition MUST be "broken"
-2. If description mentions cracks/burns/corrosion/bends/swelling → condition MUST be "damaged"
-3. Issues array MUST include location and evidence for EACH defect mentioned in description
-4. If you identify bending, explain evidence (gaps, won't sit flat, curved edges)
-5. If electrical damage, specify if burnt (black/sharp) or corroded (green/fuzzy)
-6. Do NOT confuse background surface texture with object damage
-7. Brand/model/serial: Use "" if not visible
-
-**Issues format:** "[damage type] at [location] - [evidence]"
-Examples:
-- "bent chassis - device has 2mm gap when laid flat, left edge curves outward"
-- "swollen battery - back panel bulges, screen separated from bezel with visible gap"
-- "burn damage at component U3 - black charring with sharp edges"
-- "corrosion at battery terminals - green crusty deposits, fuzzy texture"
-
-Provide JSON only:
-{
-    "object": "specific item name",
-    "brand": "",
-    "model": "",
-    "serial_number": "",
-    "condition": "broken|damaged|worn|good",
-    "issues": ["damage at location - evidence"],
-    "description": "what you observe about the object"
-}
-
-/no_think"""
-
-        response = await self._generate(prompt, [optimized_image])
+        response = await self._generate(_PROMPT_DETECT, [optimized_image])
         return self._parse_json_response(response, "object")
     
     async def extract_serial(self, image_bytes: bytes) -> dict:
         """Extract serial number and manufacturer info from image"""
         optimized_image = await self.process_image(image_bytes, max_size=1024)
         
-        prompt = """Extract product identifiers from this label image.
-
-OUTPUT JSON ONLY:
-{
-    "serial_number": "SN value or 'Not Found'",
-    "model_number": "Model or 'Not Found'",
-    "manufacturer": "Company or 'Unknown'",
-    "other_codes": ["FCC ID", "other codes"]
-}
-
-/no_think"""
-
-        response = await self._generate(prompt, [optimized_image])
+        response = await self._generate(_PROMPT_EXTRACT_SERIAL, [optimized_image])
         return self._parse_json_response(response, "serial")
     
     async def combined_detection(self, item_image: bytes, serial_image: Optional[bytes] = None) -> dict:
@@ -370,80 +652,78 @@ OUTPUT JSON ONLY:
         """Send request using reusable HTTP client for speed - with VRAM-safe options"""
         try:
             # Convert images to base64
-            images_b64 = [base64.b64encode(img).decode('utf-8') for img in images]
+            images_b64 = await asyncio.gather(*(self._b64_encode(img) for img in images))
             
-            print(f"🔍 _generate called: {len(images)} images, prompt length: {len(prompt)}")
-            print(f"🔍 Image sizes (base64): {[len(i) for i in images_b64]}")
+            logger.debug("_generate called: %d images, prompt length: %d", len(images), len(prompt))
+            logger.debug("Image sizes (base64): %s", [len(i) for i in images_b64])
             
             # NO options = use Ollama defaults (no token limits)
             payload = {
                 "model": self.model,
+                "keep_alive": KEEP_ALIVE,
                 "prompt": prompt,
                 "images": images_b64,
                 "stream": False
             }
             
             client = await self.get_client()
-            print(f"🔍 Sending request to {self.host}/api/generate...")
+            logger.debug("Sending request to %s/api/generate", self.host)
             response = await client.post(
                 f"{self.host}/api/generate",
-                json=payload
+                content=orjson.dumps(payload),
+                headers=_JSON_HEADERS
             )
-            print(f"🔍 Response status: {response.status_code}")
+            logger.debug("Response status: %s", response.status_code)
             response.raise_for_status()
             
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             result = response_data.get('response', '')
             done_reason = response_data.get('done_reason', 'unknown')
-            print(f"Ollama raw response length: {len(result)} chars, done_reason: {done_reason}")
+            logger.debug("Ollama raw response length: %d chars, done_reason: %s", len(result), done_reason)
             
             # If response is empty but thinking exists, extract it
             if not result and response_data.get('thinking'):
-                print(f"🔍 Thinking found: {response_data.get('thinking', '')[:200]}")
+                logger.debug("Thinking found: %s", response_data.get('thinking', '')[:200])
             
             return result
         except httpx.HTTPStatusError as e:
-            print(f"Ollama HTTP error: {e}")
+            logger.error("Ollama HTTP error: %s", e)
             raise
         except Exception as e:
-            print(f"Ollama generate error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Ollama generate error: %s", e)
             return ""
     
-    async def _generate_live(self, prompt: str, images: list[bytes]) -> str:
-        """Optimized generation for live video - non-streaming for simpler parsing"""
+    async def _generate_live(self, prompt: str, images_b64: list[str]) -> str:
+        """Optimized generation for live video - non-streaming for simpler parsing (images already base64)"""
         try:
-            images_b64 = [base64.b64encode(img).decode('utf-8') for img in images]
-            
             payload = {
                 "model": self.model,
+                "keep_alive": KEEP_ALIVE,
                 "prompt": prompt,
                 "images": images_b64,
                 "stream": False,
+                "format": "json",  # Constrain output to JSON - no fences/prose to strip
                 "options": self._live_inference_options  # Use live options for speed
             }
             
-            print(f"🔍 _generate_live: sending to Ollama, image size={len(images_b64[0])} chars")
+            logger.debug("_generate_live: sending to Ollama, image size=%d chars", len(images_b64[0]))
             
             client = await self.get_client()
-            response = await client.post(f"{self.host}/api/generate", json=payload)
+            response = await client.post(f"{self.host}/api/generate", content=orjson.dumps(payload), headers=_JSON_HEADERS)
             response.raise_for_status()
             
-            result = response.json()
+            result = orjson.loads(response.content)
             raw_response = result.get('response', '')
             done_reason = result.get('done_reason', 'unknown')
             
-            print(f"🔍 _generate_live: got {len(raw_response)} chars, done_reason={done_reason}")
+            logger.debug("_generate_live: got %d chars, done_reason=%s", len(raw_response), done_reason)
             if not raw_response:
-                print(f"⚠️ Empty response from Ollama! Full result: {result}")
+                logger.warning("Empty response from Ollama, full result: %s", result)
             
             return raw_response
         except Exception as e:
-            print(f"Live generate error: {e}")
-            import traceback
-            traceback.print_exc()
-            return '{"error": "' + str(e) + '"}'
+            logger.exception("Live generate error: %s", e)
+            return orjson.dumps({"error": str(e)}).decode()
     
     async def chat_response(
         self, 
@@ -494,93 +774,75 @@ Issues Found: {', '.join(issues) if issues else 'None specified'}
             # Take last 4 exchanges (8 messages) max to keep tokens low
             recent = recent_messages[-8:]
             if recent:
-                history_str = "\n=== RECENT CONVERSATION ===\n"
+                lines = ["\n=== RECENT CONVERSATION ===\n"]
                 for msg in recent:
                     role = "User" if msg['role'] == 'user' else "Assistant"
                     # Truncate long messages to save tokens
-                    content = msg['content'][:200] + "..." if len(msg['content']) > 200 else msg['content']
-                    history_str += f"{role}: {content}\n"
-                history_str += "==================\n"
+                    content = msg['content']
+                    if len(content) > 200:
+                        content = content[:200] + "..."
+                    lines.append(f"{role}: {content}\n")
+                lines.append("==================\n")
+                history_str = "".join(lines)
         
-        prompt = f"""{context_str}{history_str}
-User Question: {user_message}
-
-You are a knowledgeable repair advisor. Answer the user's question directly and helpfully.
-
-GUIDELINES:
-1. If asked "repair vs buy new" - Consider: age of item, cost of repair vs replacement, availability of parts, environmental impact. Give a balanced recommendation.
-2. If asked about cost - Give rough estimates if possible, mention it varies by location/service.
-3. If asked about difficulty - Rate as Easy/Medium/Hard and explain why.
-4. If asked general questions - Answer based on the detected item's condition and issues.
-5. Be concise but informative (under 150 words).
-6. Be encouraging about repair when practical - this is a Right to Repair assistant!
-7. If unsure, say so honestly and suggest what info would help.
-8. Remember the conversation context - don't repeat information already discussed.
-
-Respond naturally and helpfully:
-
-/no_think"""
+        prompt = f"{context_str}{history_str}\nUser Question: {user_message}\n\n{_CHAT_GUIDELINES}"
         
         try:
             client = await self.get_client()
             payload = {
                 "model": self.model,
+                "keep_alive": KEEP_ALIVE,
                 "prompt": prompt,
                 "stream": False
             }
-            response = await client.post(f"{self.host}/api/generate", json=payload)
+            response = await client.post(f"{self.host}/api/generate", content=orjson.dumps(payload), headers=_JSON_HEADERS)
             response.raise_for_status()
-            return response.json().get('response', "I'm here to help! Could you tell me more about the issue?")
+            return orjson.loads(response.content).get('response', "I'm here to help! Could you tell me more about the issue?")
         except Exception as e:
-            print(f"Chat response error: {e}")
+            logger.error("Chat response error: %s", e)
             return "I'm here to help with your repair! What would you like to know?"
     
     def _parse_json_response(self, response: str, response_type: str) -> dict:
         """Parse JSON from model response with truncation recovery"""
         try:
-            cleaned = response.strip()
-            # Remove thinking blocks if any exist (robustness)
-            cleaned = re.sub(r'<think>.*?</think>', '', cleaned, flags=re.DOTALL)
-            cleaned = re.sub(r'^```json\s*', '', cleaned)
-            cleaned = re.sub(r'^```\s*', '', cleaned)
-            cleaned = re.sub(r'\s*```$', '', cleaned)
+            cleaned = response
+            # Remove thinking blocks if any exist (robustness) - skip the regex pass when absent
+            if '<think>' in cleaned:
+                cleaned = _THINK_BLOCK_RE.sub('', cleaned)
             
-            start = cleaned.find('{')
-            end = cleaned.rfind('}') + 1
-            if start != -1 and end > start:
-                json_str = cleaned[start:end]
-                parsed = json.loads(json_str)
-                print(f"Parsed JSON successfully: object={parsed.get('object', 'N/A')}")
+            # Code fences and any trailing prose sit outside the object, so they're dropped too
+            json_str = _extract_first_json_object(cleaned)
+            if json_str is not None:
+                parsed = orjson.loads(json_str)
+                logger.debug("Parsed JSON successfully: object=%s", parsed.get('object', 'N/A'))
                 return parsed
-            elif start != -1:
+            elif (start := cleaned.find('{')) != -1:
                 # Truncated JSON - try to recover partial data
                 partial = cleaned[start:]
-                print(f"Attempting to recover truncated JSON: {partial[:100]}...")
+                logger.debug("Attempting to recover truncated JSON: %s...", partial[:100])
                 
-                # Extract what we can with regex
-                obj_match = re.search(r'"object"\s*:\s*"([^"]*)"', partial)
-                brand_match = re.search(r'"brand"\s*:\s*"([^"]*)"', partial)
-                model_match = re.search(r'"model"\s*:\s*"([^"]*)"', partial)
-                serial_match = re.search(r'"serial_number"\s*:\s*"([^"]*)"', partial)
-                condition_match = re.search(r'"condition"\s*:\s*"([^"]*)"', partial)
+                # Extract what we can with regex (first occurrence of each field)
+                fields = {}
+                for key, value in _PARTIAL_FIELD_RE.findall(partial):
+                    fields.setdefault(key, value)
                 
-                if obj_match:
+                if "object" in fields:
                     # Build recovered result
                     recovered = {
-                        "object": obj_match.group(1) if obj_match else "Unknown",
-                        "brand": brand_match.group(1) if brand_match else "",
-                        "model": model_match.group(1) if model_match else "",
-                        "serial_number": serial_match.group(1) if serial_match else "",
-                        "condition": condition_match.group(1) if condition_match else "unknown",
+                        "object": fields["object"],
+                        "brand": fields.get("brand", ""),
+                        "model": fields.get("model", ""),
+                        "serial_number": fields.get("serial_number", ""),
+                        "condition": fields.get("condition", "unknown"),
                         "issues": [],
                         "description": "Recovered from partial response"
                     }
-                    print(f"Recovered partial data: {recovered}")
+                    logger.debug("Recovered partial data: %s", recovered)
                     return recovered
             
-            print(f"No JSON found in response. Raw: {response[:200]}...")
+            logger.warning("No JSON found in response. Raw: %s...", response[:200])
         except Exception as e:
-            print(f"JSON parse error: {e}. Raw response: {response[:300]}...")
+            logger.warning("JSON parse error: %s. Raw response: %s...", e, response[:300])
         
         if response_type == "object":
             return {
@@ -0,0 +1,22 @@
+"""
+Single-flight helper - concurrent callers with the same key share one in-flight operation
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+async def single_flight(
+    inflight: dict[Hashable, asyncio.Task],
+    key: Hashable,
+    operation: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Run operation() once per key at a time; later callers await the same task
+    The task is shielded, so a cancelled caller never cancels it for the others
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(operation())
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    return await asyncio.shield(task)
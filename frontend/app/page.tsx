@@ -85,20 +85,20 @@ export default function Home() {
       // Save to localStorage for persistence
       localStorage.setItem("lastSessionId", sessionId);
       
-      // Convert messages to chat format, preserving image_data
+      // Convert messages to chat format, preserving image URLs
       const chatMessages: ChatMessage[] = data.messages.map((msg: Message) => ({
         id: String(msg.id),
         role: msg.role,
         content: msg.content,
         responseType: msg.metadata?.response_type as ChatMessage["responseType"],
         data: msg.metadata?.data as ChatMessage["data"],
-        imageUrl: msg.image_data || undefined,  // Use stored base64 image
+        imageUrl: msg.image_url || undefined,  // Served by the message image endpoint
       }));
       
       // Set lastImageUrl to the most recent user image for AI responses
-      const lastUserImage = [...data.messages].reverse().find((m: Message) => m.role === "user" && m.image_data);
-      if (lastUserImage?.image_data) {
-        setLastImageUrl(lastUserImage.image_data);
+      const lastUserImage = [...data.messages].reverse().find((m: Message) => m.role === "user" && m.image_url);
+      if (lastUserImage?.image_url) {
+        setLastImageUrl(lastUserImage.image_url);
       }
       
       console.log("Loaded messages:", chatMessages.length);
@@ -15,7 +15,7 @@ export interface Message {
   role: "user" | "assistant";
   content: string;
   images_count: number;
-  image_data?: string;
+  image_url?: string;
   metadata?: Record<string, unknown>;
   created_at: string;
 }